@@ -0,0 +1 @@
+"""Reconciliation benchmarks, see ``benchmarks.run``."""
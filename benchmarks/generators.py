@@ -0,0 +1,244 @@
+"""Synthetic reconciliation inputs.
+
+``generate`` writes a STATEMENT extract and DD, EFT and cheque (KES)
+workbooks that look like the real uploads: the statement uses the
+fixed-width layout of ``users.statement`` and the workbooks carry the
+columns ``users.recon`` filters and joins on. Most debits on the statement
+are cleared by exactly one DD, EFT or cheque; the rest are split between
+statement-only entries, clearing-only items, amount mismatches and
+duplicate references so every sheet of the report has rows.
+
+Workbooks are capped at Excel's row limit, so for the largest sizes only
+the statement reaches the requested row count.
+"""
+
+import os
+from datetime import date, timedelta
+
+import numpy as np
+from openpyxl import Workbook
+
+from users.recon import EXCLUDED_BANKS
+from users.statement import ACCOUNT, BALANCE_LABEL
+
+EXCEL_MAX_ROWS = 1048576 - 1
+
+OTHER_ACCOUNT = "KES1020000099999"
+BANKS = ["KCB BANK KENYA", "EQUITY BANK", "CO-OPERATIVE BANK", "ABSA BANK KENYA"]
+STAGES = ["ACH CREATION", "COMPLETE", "VERIFICATION"]
+
+DD_COLUMNS = [
+    "PROCNO",
+    "POLICY1",
+    "DESTBANK",
+    "DESTACCOUNT",
+    "FTREFERENCE",
+    "AMOUNT",
+    "STATUSID",
+    "STAGE",
+]
+EFT_COLUMNS = [
+    "PROCNO",
+    "ACHBULKID",
+    "CUSTACCOUNT",
+    "CUSTNAME",
+    "DESTBANK",
+    "DESTBRANCH",
+    "DESTACCOUNT",
+    "DESTACCTITLE",
+    "TRNREF",
+    "AMOUNT",
+    "VALUEDATE",
+    "REMARKS",
+    "ENDTOENDID",
+    "STATUSID",
+    "STAGE",
+]
+CHEQUE_COLUMNS = [
+    "PROCNO",
+    "CHEQUENO",
+    "DESTBANK",
+    "DESTACCOUNT",
+    "AMOUNT",
+    "STATUSID",
+    "STAGE",
+    "CBS_REJECT_REASON",
+    "REMARKS",
+]
+
+
+def generate(directory, rows, seed=0):
+    """Write a full set of inputs with ``rows`` statement lines to ``directory``.
+
+    Returns the paths keyed like the arguments of ``users.recon.reconcile``.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = {
+        "statement": os.path.join(directory, "STATEMENT"),
+        "cheques": os.path.join(directory, "KES.xls"),
+        "direct_debit": os.path.join(directory, "DD.xls"),
+        "efts": os.path.join(directory, "EFT.xls"),
+    }
+
+    fts, amounts = write_statement(paths["statement"], rows, rng)
+
+    # debits on the account are what the clearing reports pay out
+    debits = np.flatnonzero(amounts < 0)
+    cleared = rng.permutation(debits)[: int(len(debits) * 0.95)]
+    per_report = min(len(cleared) // 3, EXCEL_MAX_ROWS)
+    parts = [cleared[i * per_report : (i + 1) * per_report] for i in range(3)]
+
+    dd_fts, dd_amounts = fts[parts[0]], -amounts[parts[0]]
+    eft_fts, eft_amounts = fts[parts[1]], -amounts[parts[1]]
+
+    # items the statement never saw (FT numbers on the statement never start
+    # with 0), and DDs that were sent again as EFTs
+    extra = max(len(dd_fts) // 50, 1)
+    unknown = np.array([f"FT0{n:09d}" for n in range(extra)], dtype=object)
+    dd_fts = np.concatenate([dd_fts, unknown])
+    dd_amounts = np.concatenate([dd_amounts, rng.uniform(100, 5000, size=extra)])
+    resent = rng.choice(len(dd_fts), size=max(len(dd_fts) // 500, 1), replace=False)
+    eft_fts = np.concatenate([eft_fts, dd_fts[resent]])
+    eft_amounts = np.concatenate([eft_amounts, dd_amounts[resent]])
+
+    write_direct_debits(
+        paths["direct_debit"],
+        dd_fts[:EXCEL_MAX_ROWS],
+        dd_amounts[:EXCEL_MAX_ROWS],
+        rng,
+    )
+    write_efts(
+        paths["efts"], eft_fts[:EXCEL_MAX_ROWS], eft_amounts[:EXCEL_MAX_ROWS], rng
+    )
+    write_cheques(paths["cheques"], fts[parts[2]], -amounts[parts[2]], rng)
+    return paths
+
+
+def write_statement(path, rows, rng):
+    """Write a statement of ``rows`` lines; return the account's FTs and amounts."""
+    ft_numbers = rng.choice(9 * 10**9, size=rows, replace=False) + 10**9
+    fts = np.array([f"FT{n}" for n in ft_numbers], dtype=object)
+    amounts = np.round(rng.uniform(100, 500000, size=rows), 2)
+    amounts[rng.random(rows) < 0.7] *= -1
+    on_account = rng.random(rows) < 0.9
+
+    # a few reversals: the same FT posted again with the opposite sign
+    reversals = rng.choice(rows, size=max(rows // 500, 2) // 2 * 2, replace=False)
+    originals, reversed_ = reversals[0::2], reversals[1::2]
+    fts[reversed_] = fts[originals]
+    amounts[reversed_] = -amounts[originals]
+    on_account[reversals] = True
+
+    balance_at = int(rng.integers(rows))
+    with open(path, "w", encoding="ascii") as f:
+        for i in range(rows):
+            if i == balance_at:
+                f.write(_statement_line("", BALANCE_LABEL, "", "", "1,234,567.89-", ""))
+            amount = amounts[i]
+            text = f"{abs(amount):,.2f}" + ("-" if amount < 0 else "")
+            f.write(
+                _statement_line(
+                    str(100000 + i),
+                    f"PAYMENT REF {i}",
+                    fts[i],
+                    "KES",
+                    text,
+                    ACCOUNT if on_account[i] else OTHER_ACCOUNT,
+                )
+            )
+    return fts[on_account], amounts[on_account]
+
+
+def write_direct_debits(path, fts, amounts, rng):
+    n = len(fts)
+    rows = zip(
+        range(1, n + 1),
+        (f"POL{i:08d}" for i in range(n)),
+        _banks(rng, n),
+        rng.integers(10**9, 10**10, size=n).tolist(),
+        fts,
+        _amounts(rng, amounts).tolist(),
+        _status(rng, n),
+        rng.choice(STAGES, size=n).tolist(),
+    )
+    _write_workbook(path, DD_COLUMNS, rows)
+
+
+def write_efts(path, fts, amounts, rng):
+    n = len(fts)
+    value_date = date(2023, 5, 1)
+    rows = zip(
+        range(1, n + 1),
+        (f"ACH{i // 100:06d}" for i in range(n)),
+        rng.integers(10**9, 10**10, size=n).tolist(),
+        (f"CUSTOMER {i}" for i in range(n)),
+        _banks(rng, n),
+        (f"BRANCH {i % 50}" for i in range(n)),
+        rng.integers(10**9, 10**10, size=n).tolist(),
+        (f"ACCOUNT HOLDER {i}" for i in range(n)),
+        fts,
+        _amounts(rng, amounts).tolist(),
+        (value_date + timedelta(days=i % 28) for i in range(n)),
+        (f"CLAIM PAYMENT {i}" for i in range(n)),
+        (f"E2E{i:012d}" for i in range(n)),
+        _status(rng, n),
+        rng.choice(STAGES, size=n).tolist(),
+    )
+    _write_workbook(path, EFT_COLUMNS, rows)
+
+
+def write_cheques(path, fts, amounts, rng):
+    n = len(fts)
+    # the odd payee name with accents, a control character or a backslash,
+    # and a bank name with a control character, exercise the text sanitizing
+    remarks = rng.choice(
+        ["PAYEE LTD", "PAYEE CAFÉ LTD", "PAYEE\tLTD", "PAYEE A\\B LTD"],
+        size=n,
+        p=[0.97, 0.01, 0.01, 0.01],
+    ).tolist()
+    banks = _banks(rng, n)
+    for i in np.flatnonzero(rng.random(n) < 0.01).tolist():
+        banks[i] = "BANK OF\tAFRICA"
+    rows = zip(
+        range(1, n + 1),
+        range(500000, 500000 + n),
+        banks,
+        rng.integers(10**9, 10**10, size=n).tolist(),
+        _amounts(rng, amounts).tolist(),
+        _status(rng, n),
+        rng.choice(STAGES, size=n).tolist(),
+        (f"PAID,{ft}" for ft in fts),
+        remarks,
+    )
+    _write_workbook(path, CHEQUE_COLUMNS, rows)
+
+
+def _statement_line(ref, narration, ft, filler, amount, account):
+    return f"{ref:<13}{narration:<20}{ft:<15}{filler:<9}{amount:>32}{account:<16}\n"
+
+
+def _banks(rng, n):
+    banks = rng.choice(BANKS, size=n)
+    banks[rng.random(n) < 0.05] = EXCLUDED_BANKS[0]
+    return banks.tolist()
+
+
+def _status(rng, n):
+    return np.where(rng.random(n) < 0.95, 1, 2).tolist()
+
+
+def _amounts(rng, amounts):
+    # one in a hundred items clears for a different amount than was posted
+    off = rng.random(len(amounts)) < 0.01
+    return np.round(amounts + off * rng.uniform(1, 100, size=len(amounts)), 2)
+
+
+def _write_workbook(path, columns, rows):
+    # .xls names, xlsx content: pandas picks the reader from the file itself
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.append(columns)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
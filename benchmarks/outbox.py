@@ -0,0 +1,242 @@
+"""Time password reset requests and outbox delivery against a local SMTP server.
+
+Usage::
+
+    python -m benchmarks.outbox
+    python -m benchmarks.outbox --smtp-delay 2 --repeat 20 --check
+
+``SMTPStandIn`` is a small SMTP server on localhost that accepts every
+message after ``--smtp-delay`` seconds, and can refuse the first few with a
+temporary error. Against it, on a throwaway test database, this reports:
+
+* the median time of a password reset POST when the view sends over SMTP
+  itself, and when it queues the message in the outbox;
+* how long ``mail.deliver`` takes to send the queued messages, and over
+  how many SMTP connections;
+* that a refused message stays queued and goes out on the next attempt.
+
+``--check`` fails when a queued reset takes longer than ``RESET_BUDGET``,
+when delivery opens more than one connection per batch, or when a message
+is lost.
+"""
+
+import argparse
+import math
+import os
+import shutil
+import socketserver
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+os.environ.setdefault("SECRET_KEY", "outbox-benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+from django.utils import timezone  # noqa: E402
+
+from users import avatars, mail  # noqa: E402
+from users.models import OutboxMessage  # noqa: E402
+
+# most seconds a password reset POST may take with the outbox
+RESET_BUDGET = 0.05
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+OUTBOX_BACKEND = "users.mail.OutboxBackend"
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """An SMTP server on localhost keeping what it is sent in ``messages``.
+
+    Each message is accepted after ``delay`` seconds; the first ``refuse``
+    messages get a temporary failure instead.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay=0.0, refuse=0):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.delay = delay
+        self.refuse = refuse
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply("220 localhost SMTP stand-in")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line[:4].decode("ascii", "replace").upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 localhost")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                self._receive()
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def _receive(self):
+        lines = []
+        for line in iter(self.rfile.readline, b""):
+            if line == b".\r\n":
+                break
+            lines.append(line)
+        server = self.server
+        time.sleep(server.delay)
+        with server.lock:
+            refused = server.refuse > 0
+            if refused:
+                server.refuse -= 1
+            else:
+                server.messages.append(b"".join(lines))
+        self._reply("451 Try again later" if refused else "250 Queued")
+
+    def _reply(self, text):
+        self.wfile.write(text.encode("ascii") + b"\r\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--smtp-delay", type=float, default=0.5, help="seconds to accept a message"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="fail when a check does not hold"
+    )
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    media = tempfile.mkdtemp()
+    shutil.copy(os.path.join(settings.MEDIA_ROOT, "default.jpg"), media)
+    caches = dict(settings.CACHES)
+    for alias in ("sessions", "users"):
+        caches[alias] = {**caches[alias], "LOCATION": tempfile.mkdtemp()}
+    try:
+        with override_settings(
+            MEDIA_ROOT=media,
+            CACHES=caches,
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_TLS=False,
+            OUTBOX_BACKEND=SMTP_BACKEND,
+            # deliveries are made here, not by the background thread
+            OUTBOX_SEND_INTERVAL=0,
+        ):
+            failures = run(args.repeat, args.smtp_delay)
+            # thumbnails of the user's avatar are made in the background
+            avatars.get_executor().submit(lambda: None).result()
+    finally:
+        shutil.rmtree(media)
+        for alias in ("sessions", "users"):
+            shutil.rmtree(caches[alias]["LOCATION"])
+        teardown_databases(databases, verbosity=0)
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if args.check and failures else 0
+
+
+def run(repeat, delay):
+    """Print the timings and return the checks that did not hold."""
+    failures = []
+    user = User.objects.create_user("reset", "reset@example.com", "a-Long-passw0rd")
+
+    with SMTPStandIn(delay) as server, override_settings(EMAIL_PORT=server.port):
+        with override_settings(EMAIL_BACKEND=SMTP_BACKEND):
+            direct = _time_resets(user, repeat)
+        with override_settings(EMAIL_BACKEND=OUTBOX_BACKEND):
+            queued = _time_resets(user, repeat)
+        print(f"reset over SMTP   {direct * 1000:9.1f}ms")
+        budget = f"budget {RESET_BUDGET * 1000:.0f}ms"
+        print(f"reset to outbox   {queued * 1000:9.1f}ms ({budget})")
+        if queued > RESET_BUDGET:
+            failures.append("a queued password reset is over budget")
+
+        connections = server.connections
+        start = time.perf_counter()
+        sent = mail.deliver()
+        seconds = time.perf_counter() - start
+        connections = server.connections - connections
+        batches = math.ceil(repeat / settings.OUTBOX_BATCH)
+        print(
+            f"delivery          {seconds * 1000:9.1f}ms for {sent} messages"
+            f" over {connections} connections"
+        )
+        if sent != repeat or OutboxMessage.objects.exists():
+            failures.append(f"{sent} of {repeat} queued messages were sent")
+        if connections > batches:
+            failures.append(f"{connections} connections for {batches} batches")
+        if len(server.messages) != 2 * repeat:
+            failures.append(f"the server got {len(server.messages)} messages")
+
+    with SMTPStandIn(refuse=1) as server, override_settings(
+        EMAIL_PORT=server.port, EMAIL_BACKEND=OUTBOX_BACKEND
+    ):
+        Client().post("/password-reset/", {"email": user.email})
+        first = mail.deliver()
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        second = mail.deliver()
+        print(
+            f"retry             sent {first} on the first attempt, {second} on the next"
+        )
+        if (first, second) != (0, 1) or server.messages == []:
+            failures.append("a refused message was not sent again")
+    return failures
+
+
+def _time_resets(user, repeat):
+    client = Client()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.post("/password-reset/", {"email": user.email})
+        timings.append(time.perf_counter() - start)
+        if response.status_code != 302:
+            raise SystemExit(f"password reset answered {response.status_code}")
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
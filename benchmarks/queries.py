@@ -0,0 +1,184 @@
+"""Count the queries and time the login, register and profile flows.
+
+Usage::
+
+    python -m benchmarks.queries
+    python -m benchmarks.queries --repeat 20 --check
+
+Each flow is run ``--repeat`` times with the test client against a
+throwaway test database, printing its median latency and the queries it
+made. ``--check`` fails when a flow makes more queries than its budget in
+``BUDGETS``, so a signal or middleware that starts writing on every sign in
+shows up before it ships. Lower a budget when a change saves queries.
+
+Passwords are hashed with MD5 here so the timings show the app's own
+overhead rather than the password hasher's.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+os.environ.setdefault("SECRET_KEY", "queries-benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+
+from users import avatars  # noqa: E402
+
+# most queries each flow may make
+BUDGETS = {
+    "login": 7,
+    "register": 3,
+    "profile view": 0,
+    "profile update": 3,
+}
+
+PASSWORD = "a-Long-passw0rd"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--check", action="store_true", help="fail when a flow is over budget"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="print the queries of each flow"
+    )
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    media = tempfile.mkdtemp()
+    shutil.copy(os.path.join(settings.MEDIA_ROOT, "default.jpg"), media)
+    caches = dict(settings.CACHES)
+    for alias in ("sessions", "users"):
+        caches[alias] = {**caches[alias], "LOCATION": tempfile.mkdtemp()}
+    try:
+        with override_settings(
+            MEDIA_ROOT=media,
+            CACHES=caches,
+            PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+        ):
+            results = run(args.repeat)
+    finally:
+        shutil.rmtree(media)
+        for alias in ("sessions", "users"):
+            shutil.rmtree(caches[alias]["LOCATION"])
+        teardown_databases(databases, verbosity=0)
+
+    over = []
+    for name, (seconds, queries) in results.items():
+        budget = BUDGETS[name]
+        flag = "" if len(queries) <= budget else "  OVER BUDGET"
+        print(
+            f"{name:<16} {seconds * 1000:8.1f}ms {len(queries):3} queries"
+            f" (budget {budget}){flag}"
+        )
+        if args.verbose or flag:
+            for query in queries:
+                print(f"    {query['sql']}")
+        if flag:
+            over.append(name)
+    return 1 if args.check and over else 0
+
+
+def run(repeat):
+    """Return the median seconds and the queries of each flow."""
+    flows = {
+        "login": _login,
+        "register": _register,
+        "profile view": _profile_view,
+        "profile update": _profile_update,
+    }
+    results = {}
+    for name, flow in flows.items():
+        timings = []
+        for number in range(repeat):
+            request = flow(number)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = request()
+                timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise SystemExit(f"{name} answered {response.status_code}")
+            # thumbnails are made off the request; keep them out of the next run
+            avatars.get_executor().submit(lambda: None).result()
+        results[name] = (statistics.median(timings), queries.captured_queries)
+    return results
+
+
+def _user(number):
+    username = f"user{number}-{time.monotonic_ns()}"
+    return User.objects.create_user(username, f"{username}@example.com", PASSWORD)
+
+
+def _login(number):
+    user = _user(number)
+    client = Client()
+    return lambda: client.post(
+        "/login/", {"username": user.username, "password": PASSWORD}
+    )
+
+
+def _register(number):
+    username = f"new{number}-{time.monotonic_ns()}"
+    client = Client()
+    return lambda: client.post(
+        "/register/",
+        {
+            "first_name": "New",
+            "last_name": "User",
+            "username": username,
+            "email": f"{username}@example.com",
+            "password1": PASSWORD,
+            "password2": PASSWORD,
+        },
+    )
+
+
+def _profile_view(number):
+    client = _signed_in(_user(number))
+    return lambda: client.get("/profile/")
+
+
+def _profile_update(number):
+    user = _user(number)
+    client = _signed_in(user)
+    return lambda: client.post(
+        "/profile/",
+        {"username": user.username, "email": user.email, "bio": f"bio {number}"},
+    )
+
+
+def _signed_in(user):
+    # the new user's thumbnails would drop it from the cache when saved
+    avatars.get_executor().submit(lambda: None).result()
+    client = Client()
+    client.force_login(user)
+    # the first page after signing in loads the user into the cache
+    client.get("/")
+    return client
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""The original in-request reconciliation, kept as a correctness reference.
+
+This is the body of the ``read`` view as it was before reconciliation moved
+to ``users.recon``, with only the request handling taken out. The benchmark
+check compares the workbook it writes with the one ``users.recon`` writes.
+"""
+
+import pandas as pd
+
+pd.options.mode.chained_assignment = None  # default='warn'
+
+
+def _escape(frame):
+    func = lambda x: (  # noqa: E731
+        x.encode("unicode_escape").decode("utf-8") if isinstance(x, str) else x
+    )
+    # DataFrame.applymap was renamed to DataFrame.map in pandas 2.1
+    if hasattr(frame, "map"):
+        return frame.map(func)
+    return frame.applymap(func)
+
+
+def reconcile(excel_fileSTAT, excel_fileCHQ, excel_fileDD, excel_fileEFT, output_path):
+    sdf = pd.read_fwf(excel_fileSTAT, header=None, widths=[13, 20, 15, 9, 32, 16])
+
+    sortdf = sdf.sort_values(0)
+
+    val = sortdf.loc[(sortdf[1] == "BALANCE AT PERIOD EN"), 4].iloc[0]
+
+    df = sortdf.loc[sortdf[5].isin(["KES1020000010001"])]
+    df.loc[df[4].str.endswith("-"), 4] = "-" + df.loc[
+        df[4].str.endswith("-"), 4
+    ].str.strip("- ")
+
+    cleandf = df[[1, 2, 4]]
+    cleandf.columns = ["NARRATION", "FT", "AMOUNT"]
+
+    cleandf["AMOUNT"] = cleandf["AMOUNT"].str.replace(",", "").astype(float)
+
+    cleandf = cleandf.sort_values(["AMOUNT"])
+
+    postivesum = cleandf[cleandf["AMOUNT"] > 0]["AMOUNT"].sum()
+    negativesum = cleandf[cleandf["AMOUNT"] < 0]["AMOUNT"].sum()
+
+    DDrawreport = pd.read_excel(excel_fileDD, index_col=False)
+    DDrawreport[["PROCNO", "DESTACCOUNT"]] = DDrawreport[
+        ["PROCNO", "DESTACCOUNT"]
+    ].astype(str)
+    DDreport = DDrawreport[
+        (
+            DDrawreport["STATUSID"].isin([1])
+            & (~DDrawreport["DESTBANK"].isin(["NCBA BANK KENYA PLC", "NIC BANK PLC"]))
+        )
+    ]
+    DDdf = DDreport[["POLICY1", "FTREFERENCE", "AMOUNT"]]
+    DDdf.columns = ["POLICY1", "FT", "AMOUNT"]
+    DDdf["AMOUNT"] = DDdf["AMOUNT"].astype(float)
+
+    DDsum = DDdf["AMOUNT"].sum()
+
+    EFTdata = pd.read_excel(excel_fileEFT, index_col=False)
+    EFTdata[["PROCNO", "DESTACCOUNT"]] = EFTdata[["PROCNO", "DESTACCOUNT"]].astype(str)
+    EFTdf = EFTdata[["ACHBULKID", "TRNREF", "AMOUNT"]]
+    EFTdf.columns = ["ACHBULKID", "FT", "AMOUNT"]
+    EFTsum = EFTdf["AMOUNT"].sum()
+
+    CHQraw = pd.read_excel(excel_fileCHQ, index_col=False)
+    CHQraw[["PROCNO", "DESTACCOUNT", "CHEQUENO"]] = CHQraw[
+        ["PROCNO", "DESTACCOUNT", "CHEQUENO"]
+    ].astype(str)
+
+    if "STATUSID" in CHQraw:
+        CHQs = CHQraw[
+            (
+                CHQraw["STATUSID"].isin([1])
+                & (~CHQraw["DESTBANK"].isin(["NCBA BANK KENYA PLC", "NIC BANK PLC"]))
+                & (CHQraw["STAGE"].isin(["ACH CREATION", "COMPLETE"]))
+            )
+        ]
+    else:
+        CHQs = CHQraw[
+            (~CHQraw["DESTBANK"].isin(["NCBA BANK KENYA PLC", "NIC BANK PLC"]))
+            & (CHQraw["STAGE"].isin(["ACH CREATION"]))
+        ]
+
+    if CHQs["CBS_REJECT_REASON"].str.contains("NOCREDIT").any():
+        CHQdf = CHQs[["CHEQUENO", "CBS_REJECT_REASON", "AMOUNT"]]
+        CHQdf[["FT", "FT1", "FT2"]] = CHQdf.CBS_REJECT_REASON.str.split(
+            "[,-]", expand=True
+        )
+        CHQclr = CHQdf[["CHEQUENO", "FT1", "AMOUNT"]]
+        CHQclr.columns = ["CHEQUENO", "FT", "AMOUNT"]
+    else:
+        CHQdf = CHQs[["CHEQUENO", "CBS_REJECT_REASON", "AMOUNT"]]
+        CHQdf[["FT", "FT1"]] = CHQdf.CBS_REJECT_REASON.str.split("[,]", expand=True)
+        CHQclr = CHQdf[["CHEQUENO", "FT1", "AMOUNT"]]
+        CHQclr.columns = ["CHEQUENO", "FT", "AMOUNT"]
+
+    CHQsum = CHQclr["AMOUNT"].sum()
+
+    frames = [DDdf, EFTdf, CHQclr]
+
+    allcleared = pd.concat(frames)
+
+    left_join = pd.merge(cleandf, allcleared, on="FT", how="left")
+
+    T24E = left_join[(~left_join["AMOUNT_y"].notnull())]
+
+    left_join2 = pd.merge(allcleared, cleandf, on="FT", how="left")
+
+    CPE = left_join2[(~left_join2["AMOUNT_y"].notnull())]
+
+    totaldebits = DDsum + CHQsum
+    summarydata = [
+        ["TOTAL STATEMENT CREDITS", postivesum],
+        ["TOTAL STATEMENT DEBITS", negativesum],
+        ["DIRECT DEBITS", DDsum],
+        ["CHEQUES", CHQsum],
+        ["EFTs", EFTsum],
+        ["TOTAL DEBITS CLEARED", totaldebits],
+        ["BALANCE AT THE END", val],
+    ]
+    summarydf = pd.DataFrame(summarydata, columns=["DESCRIPTION", "AMOUNT"])
+
+    reversals = cleandf[cleandf.duplicated(["FT"], keep=False)]
+    reversals2 = allcleared[
+        (allcleared.duplicated(["FT"], keep=False))
+        & (allcleared["FT"].str.contains("FT"))
+    ]
+
+    CHQsDf = _escape(CHQs)
+
+    amountcheck = left_join[(left_join["AMOUNT_y"].notnull())]
+    amountcheck["Diff"] = amountcheck["AMOUNT_y"] - abs(amountcheck["AMOUNT_x"])
+
+    WorryDiff = amountcheck.loc[(abs(amountcheck.Diff)) > 0.5]
+
+    with pd.ExcelWriter(output_path) as writer:
+        cleandf.to_excel(writer, sheet_name="Statement", index=False)
+        allcleared.to_excel(writer, sheet_name="Cleared", index=False)
+        T24E.to_excel(writer, sheet_name="T24 Exceptions", index=False)
+        CPE.to_excel(writer, sheet_name="CP Exceptions", index=False)
+        summarydf.to_excel(writer, sheet_name="Summary", index=False)
+        DDreport.to_excel(writer, sheet_name="DDS", index=False)
+        EFTdata.to_excel(writer, sheet_name="EFTs", index=False)
+        CHQsDf.to_excel(writer, sheet_name="CHQs", index=False)
+        reversals.to_excel(writer, sheet_name="REVERSALS FROM LIVE", index=False)
+        WorryDiff.to_excel(writer, sheet_name="AMOUNT_CHECK", index=False)
+        reversals2.to_excel(writer, sheet_name="CLEARED DUPLICATE", index=False)
+
+    return summarydata
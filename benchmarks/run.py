@@ -0,0 +1,248 @@
+"""Time the reconciliation pipeline on synthetic inputs.
+
+Usage::
+
+    python -m benchmarks.run --rows 10000 --rows 100000
+    python -m benchmarks.run --rows 10000 --check
+    python -m benchmarks.run --rows 100000 --compare benchmarks/results/<old>.json
+
+Each size gets a fresh set of inputs from ``benchmarks.generators``. The
+parse, filter, join and export stages are timed separately (each input
+parse on its own, then ``parse`` for all four loaded in parallel), followed by
+an end-to-end ``reconcile``. Results are written as JSON to
+``benchmarks/results/`` so runs from different commits can be compared
+with ``--compare``. ``--check`` also runs the original implementation in
+``benchmarks.reference`` and fails if any sheet of the report differs.
+
+The parse cache is disabled so every run measures real parsing.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+os.environ["RECON_CACHE_ENABLED"] = "false"
+
+import django  # noqa: E402
+
+django.setup()
+
+import pandas as pd  # noqa: E402
+
+from benchmarks import generators, reference  # noqa: E402
+from users import readers, recon, sources  # noqa: E402
+from users.matching import match  # noqa: E402
+from users.statement import parse_statement  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# sheets whose row order depends on how ties in AMOUNT are sorted
+UNORDERED_SHEETS = ["Statement", "REVERSALS FROM LIVE"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        action="append",
+        help="statement lines to generate; repeat for several sizes (default 10000)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workdir", help="where to put generated inputs (default: a temp dir)"
+    )
+    parser.add_argument("--output", help="results file (default: timestamped)")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the report with the original implementation",
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "excel_engine": readers.engine_for(readers.XLSX),
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        for rows in args.rows or [10000]:
+            run = bench(os.path.join(workdir, str(rows)), rows, args.seed, args.check)
+            results["runs"].append(run)
+            _print_run(run)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+    if any(run.get("check") not in (None, "ok") for run in results["runs"]):
+        return 1
+    return 0
+
+
+def bench(directory, rows, seed=0, check=False):
+    """Generate inputs with ``rows`` statement lines and time every stage."""
+    start = time.perf_counter()
+    paths = generators.generate(directory, rows, seed)
+    run = {
+        "rows": rows,
+        "generate": time.perf_counter() - start,
+        "stages": {},
+        "sizes": {},
+    }
+    stages = run["stages"]
+
+    with _timed(stages, "parse.statement"):
+        cleandf, val = parse_statement(paths["statement"])
+    with _timed(stages, "parse.direct_debit"):
+        DDtable = sources.load(paths["direct_debit"], sources.DIRECT_DEBITS)
+    with _timed(stages, "parse.efts"):
+        EFTtable = sources.load(paths["efts"], sources.EFTS)
+    with _timed(stages, "parse.cheques"):
+        CHQtable = sources.load(paths["cheques"], sources.CHEQUES)
+    # the four parses again, at once as the pipeline does them
+    with _timed(stages, "parse"):
+        recon.load_recon_inputs(
+            paths["statement"],
+            paths["cheques"],
+            paths["direct_debit"],
+            paths["efts"],
+        )
+
+    with _timed(stages, "filter"):
+        _, DDdf = recon.filter_direct_debits(DDtable.frame)
+        EFTdf = recon.filter_efts(EFTtable.frame)
+        _, CHQclr = recon.filter_cheques(CHQtable.frame)
+
+    with _timed(stages, "join"):
+        match(cleandf, pd.concat([DDdf, EFTdf, CHQclr]))
+
+    sheets, _, _ = recon.build_recon(cleandf, val, DDtable, EFTtable, CHQtable)
+    output = os.path.join(directory, "Recon.xlsx")
+    with _timed(stages, "export"):
+        recon.write_report(output, sheets)
+
+    run["sizes"] = {
+        name: len(frame() if callable(frame) else frame) for name, frame in sheets
+    }
+
+    start = time.perf_counter()
+    recon.reconcile(
+        paths["statement"],
+        paths["cheques"],
+        paths["direct_debit"],
+        paths["efts"],
+        output,
+    )
+    run["total"] = time.perf_counter() - start
+
+    if check:
+        expected = os.path.join(directory, "Reference.xlsx")
+        start = time.perf_counter()
+        reference.reconcile(
+            paths["statement"],
+            paths["cheques"],
+            paths["direct_debit"],
+            paths["efts"],
+            expected,
+        )
+        run["reference_total"] = time.perf_counter() - start
+        run["check"] = check_reports(expected, output)
+
+    return run
+
+
+def check_reports(expected, actual):
+    """Return ``"ok"`` if the two workbooks hold the same sheets and rows."""
+    expected = pd.read_excel(expected, sheet_name=None)
+    actual = pd.read_excel(actual, sheet_name=None)
+    if list(expected) != list(actual):
+        return f"sheets differ: {list(expected)} != {list(actual)}"
+    for name in expected:
+        left, right = expected[name], actual[name]
+        if name in UNORDERED_SHEETS:
+            left = left.sort_values(list(left.columns)).reset_index(drop=True)
+            right = right.sort_values(list(right.columns)).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(left, right, check_dtype=False)
+        except AssertionError as exc:
+            return f"sheet {name!r} differs: {exc}"
+    return "ok"
+
+
+def compare(before, after):
+    """Print stage timings of two result sets side by side."""
+    print(f"\nComparing {before['commit']} -> {after['commit']}")
+    old_runs = {run["rows"]: run for run in before["runs"]}
+    for run in after["runs"]:
+        old = old_runs.get(run["rows"])
+        if old is None:
+            continue
+        print(f"{run['rows']} rows")
+        timings = [
+            (name, old["stages"].get(name), t) for name, t in run["stages"].items()
+        ]
+        timings.append(("total", old.get("total"), run["total"]))
+        for name, was, now in timings:
+            if was is None:
+                continue
+            print(f"  {name:<20} {was:9.3f}s -> {now:9.3f}s  x{was / now:5.2f}")
+
+
+def _print_run(run):
+    print(f"{run['rows']} rows (inputs generated in {run['generate']:.1f}s)")
+    for name, seconds in run["stages"].items():
+        print(f"  {name:<20} {seconds:9.3f}s")
+    print(f"  {'total':<20} {run['total']:9.3f}s")
+    if "check" in run:
+        print(f"  reference total      {run['reference_total']:9.3f}s")
+        print(f"  check: {run['check']}")
+
+
+class _timed:
+    def __init__(self, stages, name):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.stages[self.name] = time.perf_counter() - self.start
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Measure worker start-up time and memory for each group of URLs.
+
+Usage::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 5 --output startup.json
+
+Every group runs in a fresh interpreter, the way a newly started worker
+would: it sets Django up, loads the URL configuration and then serves the
+group's pages once each with the test client. The time to get ready, the
+time of each first request, the resident memory after start-up and after
+the requests, and whether the heavy reconciliation modules got imported
+are reported, as the median of ``--repeat`` runs. An ``auth`` worker
+should never load pandas; a ``recon`` worker loads it on its first
+request.
+
+Only anonymous GETs are made, so no database is written to.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# pages served by each kind of worker
+GROUPS = {
+    "boot": [],
+    "auth": ["/", "/login/", "/register/", "/password-reset/"],
+    "recon": ["/read/", "/stat/", "/metrics/"],
+}
+
+# modules whose import a lean worker should avoid
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "users.recon_views"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="results file (default: timestamped)")
+    parser.add_argument("--child", choices=GROUPS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return 0
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "groups": {},
+    }
+    for group in GROUPS:
+        runs = [_run_child(group) for _ in range(args.repeat)]
+        results["groups"][group] = summary = _median(runs)
+        _print_group(group, summary)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, "startup-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+def measure(group):
+    """Start Django in this process and serve the pages of ``group``."""
+    start = time.perf_counter()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+    import django
+
+    django.setup()
+
+    from django.test import Client
+    from django.urls import get_resolver
+
+    # resolving the patterns imports the URL configuration and its views
+    get_resolver().url_patterns
+    run = {
+        "ready": time.perf_counter() - start,
+        "ready_rss_bytes": _rss(),
+        "requests": {},
+    }
+
+    client = Client(HTTP_HOST="localhost")
+    for url in GROUPS[group]:
+        start = time.perf_counter()
+        response = client.get(url)
+        run["requests"][url] = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise SystemExit(f"{url} answered {response.status_code}")
+
+    run["rss_bytes"] = _rss()
+    run["heavy_modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+    return run
+
+
+def _run_child(group):
+    env = dict(os.environ, SECRET_KEY=os.getenv("SECRET_KEY", "startup-benchmark"))
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", group],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if completed.returncode:
+        raise SystemExit(f"{group} run failed:\n{completed.stderr}")
+    # the JSON document is the last line; pages may print before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _median(runs):
+    return {
+        "ready": statistics.median(run["ready"] for run in runs),
+        "ready_rss_bytes": statistics.median(run["ready_rss_bytes"] for run in runs),
+        "rss_bytes": statistics.median(run["rss_bytes"] for run in runs),
+        "requests": {
+            url: statistics.median(run["requests"][url] for run in runs)
+            for url in runs[0]["requests"]
+        },
+        "heavy_modules": runs[0]["heavy_modules"],
+    }
+
+
+def _print_group(group, summary):
+    print(
+        f"{group:<6} ready {summary['ready']:6.3f}s"
+        f"  rss {summary['ready_rss_bytes'] / 2**20:6.1f} MiB"
+        f" -> {summary['rss_bytes'] / 2**20:6.1f} MiB"
+        f"  heavy: {', '.join(summary['heavy_modules']) or '-'}"
+    )
+    for url, seconds in summary["requests"].items():
+        print(f"  {url:<20} {seconds:9.3f}s")
+
+
+def _rss():
+    """Current resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # peak rather than current RSS, in KiB on Linux and bytes on macOS
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+if __name__ == "__main__":
+    sys.exit(main())
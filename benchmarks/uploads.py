@@ -0,0 +1,248 @@
+"""Compare multipart and chunked uploads of a large statement.
+
+Usage::
+
+    python -m benchmarks.uploads
+    python -m benchmarks.uploads --size 300 --check
+
+On a throwaway test database and ``MEDIA_ROOT``, a statement of ``--size``
+MB and three small clearing files are stored as a reconciliation upload
+twice:
+
+* as one multipart POST through ``FileForm``, the way ``read/`` takes them;
+* in ``UPLOAD_CHUNK_SIZE`` chunks through the ``uploads/`` endpoints, then
+  registered on a ``File`` row the way ``read/uploaded/`` does.
+
+Reported for each: the time taken and the bytes the process read and wrote,
+from ``/proc/self/io``; both read the files once to send them. The chunked
+upload is then checked to resume after a rejected chunk and in a worker
+that did not take the earlier chunks, and to store the file under its
+SHA-256.
+
+``--check`` fails when the chunked upload reads or writes more than
+``IO_BUDGET`` times the size of the files, or a check does not hold.
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+os.environ.setdefault("SECRET_KEY", "uploads-benchmark")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import Client, RequestFactory  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+)
+
+from users import uploads  # noqa: E402
+from users.forms import FileForm  # noqa: E402
+from users.models import File  # noqa: E402
+
+# most bytes a chunked upload may read or write, as a multiple of the
+# file sizes
+IO_BUDGET = 1.1
+
+FIELDS = ("Statement", "Cheques", "EFTs", "Direct_Debit")
+SMALL_SIZE = 256 * 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=100, help="statement MB")
+    parser.add_argument(
+        "--check", action="store_true", help="fail when a check does not hold"
+    )
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False)
+    media = tempfile.mkdtemp()
+    shutil.copy(os.path.join(settings.MEDIA_ROOT, "default.jpg"), media)
+    source = tempfile.mkdtemp()
+    caches = dict(settings.CACHES)
+    for alias in ("sessions", "users"):
+        caches[alias] = {**caches[alias], "LOCATION": tempfile.mkdtemp()}
+    try:
+        with override_settings(MEDIA_ROOT=media, CACHES=caches):
+            files = _make_files(source, args.size * 1024 * 1024)
+            failures = run(files)
+    finally:
+        for directory in (media, source):
+            shutil.rmtree(directory)
+        for alias in ("sessions", "users"):
+            shutil.rmtree(caches[alias]["LOCATION"])
+        teardown_databases(databases, verbosity=0)
+
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if args.check and failures else 0
+
+
+def run(files):
+    """Print the timings and return the checks that did not hold."""
+    failures = []
+    total = sum(os.path.getsize(path) for path in files.values())
+    user = User.objects.create_user("uploader", "", "a-Long-passw0rd")
+    client = Client()
+    client.force_login(user)
+    # what a client knows before it starts, so not timed
+    digests = {path: _sha256(path) for path in files.values()}
+
+    start, io = time.perf_counter(), _io()
+    _multipart(files)
+    _report("multipart", total, time.perf_counter() - start, io)
+
+    # the same files again would be found in storage without being written
+    shutil.rmtree(os.path.join(settings.MEDIA_ROOT, uploads.DIRECTORY))
+    start, io = time.perf_counter(), _io()
+    upload = File.objects.create(**_chunked(client, user, files, digests))
+    read, written = _report("chunked", total, time.perf_counter() - start, io)
+    budget = IO_BUDGET * total
+    if read > budget or written > budget:
+        failures.append(
+            f"the chunked upload read {read} and wrote {written} bytes, over {budget}"
+        )
+    for field, path in files.items():
+        if _sha256(getattr(upload, field).path) != digests[path]:
+            failures.append(f"the stored {field} differs from the upload")
+
+    path = files["Statement"]
+    failures.extend(_check_resume(client, path, digests[path]))
+    return failures
+
+
+def _multipart(files):
+    handles = {field: open(path, "rb") for field, path in files.items()}
+    try:
+        request = RequestFactory().post("/read/", handles)
+    finally:
+        for handle in handles.values():
+            handle.close()
+    form = FileForm(request.POST, request.FILES)
+    if not form.is_valid():
+        raise SystemExit(f"the multipart upload is invalid: {form.errors}")
+    form.save()
+    for uploaded in request.FILES.values():
+        uploaded.close()
+
+
+def _chunked(client, user, files, digests):
+    ids = {}
+    for field, path in files.items():
+        session = _start(client, path, digests[path])
+        with open(path, "rb") as f:
+            while session["received"] < session["size"]:
+                session = _put(client, session, f.read(session["chunk_size"]))
+        ids[field] = session["id"]
+    return uploads.stored_names(user, ids)
+
+
+def _check_resume(client, path, sha256):
+    failures = []
+    session = _start(client, path, sha256)
+    with open(path, "rb") as f:
+        chunk = f.read(session["chunk_size"])
+        session = _put(client, session, chunk)
+        bad = client.put(
+            session["url"],
+            f.read(session["chunk_size"]),
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(session["received"]),
+            HTTP_CHUNK_SHA256=hashlib.sha256(b"not this chunk").hexdigest(),
+        )
+        if bad.status_code != 400 or bad.json()["received"] != len(chunk):
+            failures.append("a chunk with the wrong checksum was kept")
+
+        # as if the rest went to another worker after the connection dropped
+        uploads._hashes.clear()
+        session = client.get(session["url"]).json()
+        f.seek(session["received"])
+        while session["received"] < session["size"]:
+            session = _put(client, session, f.read(session["chunk_size"]))
+    print(f"resumed           {session['status']}")
+    if session["sha256"] != sha256:
+        failures.append("the resumed upload has the wrong SHA-256")
+    return failures
+
+
+def _start(client, path, sha256):
+    response = client.post(
+        "/uploads/",
+        {
+            "filename": os.path.basename(path),
+            "size": os.path.getsize(path),
+            "sha256": sha256,
+        },
+    )
+    if response.status_code != 201:
+        raise SystemExit(f"starting an upload answered {response.status_code}")
+    return response.json()
+
+
+def _put(client, session, chunk):
+    response = client.put(
+        session["url"],
+        chunk,
+        content_type="application/octet-stream",
+        HTTP_UPLOAD_OFFSET=str(session["received"]),
+        HTTP_CHUNK_SHA256=hashlib.sha256(chunk).hexdigest(),
+    )
+    if response.status_code != 200:
+        raise SystemExit(f"a chunk answered {response.status_code}: {response.json()}")
+    return response.json()
+
+
+def _make_files(directory, size):
+    files = {}
+    for field in FIELDS:
+        path = os.path.join(directory, f"{field}.xlsx")
+        with open(path, "wb") as f:
+            remaining = size if field == "Statement" else SMALL_SIZE
+            while remaining:
+                block = os.urandom(min(1024 * 1024, remaining))
+                f.write(block)
+                remaining -= len(block)
+        files[field] = path
+    return files
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _io():
+    with open("/proc/self/io") as f:
+        counters = dict(line.split(": ") for line in f.read().splitlines())
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+def _report(name, total, seconds, io):
+    """Print and return the bytes read and written since ``io``."""
+    read, written = (now - then for now, then in zip(_io(), io))
+    print(
+        f"{name:<17} {seconds * 1000:9.1f}ms, read {read / 2**20:7.1f}MB,"
+        f" wrote {written / 2**20:7.1f}MB for {total / 2**20:.1f}MB"
+    )
+    return read, written
+
+
+if __name__ == "__main__":
+    sys.exit(main())
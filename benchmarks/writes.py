@@ -0,0 +1,191 @@
+"""Load test SQLite writes from several worker processes at once.
+
+Usage::
+
+    python -m benchmarks.writes
+    python -m benchmarks.writes --workers 8 --seconds 20 --output writes.json
+
+For each database configuration in ``CONFIGS`` a throwaway database is
+migrated, then ``--workers`` processes hammer it for ``--seconds``, the way
+web workers do under load. Each operation is one request's worth of
+writes: a transaction that reads a user and updates its ``last_login``,
+then a new ``django_session`` row on its own. Connections are released
+between operations as at the end of a request, so ``CONN_MAX_AGE`` counts.
+
+Reported per configuration: operations per second across all workers, the
+operations that failed with "database is locked", and the median, 95th
+percentile and worst latency of an operation.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# "default" is what the settings use; "stock" is Django's own backend
+CONFIGS = {
+    "stock": {"ENGINE": "django.db.backends.sqlite3"},
+    "default": {},
+}
+
+USERS = 50
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--output", help="results file (default: timestamped)")
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        config, path, start, seconds = args.child
+        print(json.dumps(work(config, path, float(start), float(seconds))))
+        return 0
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "workers": args.workers,
+        "seconds": args.seconds,
+        "configs": {},
+    }
+    for config in CONFIGS:
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "db.sqlite3")
+            _run_children(config, path, 0, 0, 1)
+            runs = _run_children(
+                config, path, time.time() + 5, args.seconds, args.workers
+            )
+        finally:
+            shutil.rmtree(directory)
+        results["configs"][config] = summary = _summarize(runs, args.seconds)
+        _print_config(config, summary)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, "writes-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    return 0
+
+
+def work(config, path, start, seconds):
+    """Write to the database at ``path`` from ``start`` for ``seconds``.
+
+    With no ``seconds`` the database is migrated and given its users instead.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_management.settings")
+    from django.conf import settings
+
+    database = settings.DATABASES["default"]
+    if config == "stock":
+        database.clear()
+    database.update(CONFIGS[config], NAME=path)
+    import django
+
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.models import Session
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, transaction
+    from django.utils import timezone
+
+    if not seconds:
+        call_command("migrate", verbosity=0)
+        User.objects.bulk_create(User(username=f"user{n}") for n in range(USERS))
+        return {}
+
+    user_ids = list(User.objects.values_list("pk", flat=True))
+    close_old_connections()
+    time.sleep(max(0, start - time.time()))
+
+    latencies, locked, number = [], 0, 0
+    end = start + seconds
+    while time.time() < end:
+        number += 1
+        began = time.perf_counter()
+        try:
+            with transaction.atomic():
+                user = User.objects.filter(pk=user_ids[number % len(user_ids)])
+                user.values_list("last_login", flat=True).get()
+                user.update(last_login=timezone.now())
+            Session.objects.create(
+                session_key=f"{os.getpid()}-{number}",
+                session_data="{}",
+                expire_date=timezone.now() + timedelta(days=1),
+            )
+        except OperationalError as error:
+            if "locked" not in str(error):
+                raise
+            locked += 1
+        else:
+            latencies.append(time.perf_counter() - began)
+        finally:
+            close_old_connections()
+    return {"latencies": latencies, "locked": locked}
+
+
+def _run_children(config, path, start, seconds, workers):
+    env = dict(os.environ, SECRET_KEY=os.getenv("SECRET_KEY", "writes-benchmark"))
+    command = [sys.executable, "-m", "benchmarks.writes", "--child"]
+    children = [
+        subprocess.Popen(
+            command + [config, path, str(start), str(seconds)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        for _ in range(workers)
+    ]
+    runs = []
+    for child in children:
+        stdout, stderr = child.communicate()
+        if child.returncode:
+            raise SystemExit(f"{config} worker failed:\n{stderr}")
+        # the JSON document is the last line
+        runs.append(json.loads(stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def _summarize(runs, seconds):
+    latencies = sorted(latency for run in runs for latency in run["latencies"])
+    if not latencies:
+        latencies = [0.0]
+    return {
+        "operations_per_second": sum(len(run["latencies"]) for run in runs) / seconds,
+        "locked": sum(run["locked"] for run in runs),
+        "median": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "max": latencies[-1],
+    }
+
+
+def _print_config(config, summary):
+    print(
+        f"{config:<8} {summary['operations_per_second']:8.1f} ops/s"
+        f"  locked {summary['locked']:5}"
+        f"  median {summary['median'] * 1000:7.1f}ms"
+        f"  p95 {summary['p95'] * 1000:7.1f}ms"
+        f"  max {summary['max'] * 1000:8.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
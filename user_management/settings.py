@@ -51,7 +51,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.auth_cache.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -84,12 +84,21 @@ WSGI_APPLICATION = 'user_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# SQLite in WAL mode with writes that wait for the lock, see users/sqlite3/base.py
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'users.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # seconds a request keeps its connection for the next one
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # seconds a write waits for another worker's lock
+            'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 10)),
+        },
     }
 }
+SQLITE_LOCK_RETRIES = int(os.getenv('SQLITE_LOCK_RETRIES', 3))
 
 
 # Password validation
@@ -140,6 +149,21 @@ STATIC_URL = '/static/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# how media files are sent, see users/media.py: 'python' streams them from
+# the worker, 'x-accel-redirect' (nginx) and 'x-sendfile' (Apache, lighttpd)
+# have the front-end server send them
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', 'python')
+# internal nginx location aliasing MEDIA_ROOT, for 'x-accel-redirect'
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+# seconds browsers keep avatars; thumbnails are kept for a year
+MEDIA_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', 60 * 60 * 24))
+
+# chunked uploads of statements and clearing reports, see users/uploads.py
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 ** 3))
+# seconds an unfinished upload is kept after its last chunk
+UPLOAD_SESSION_MAX_AGE = int(os.getenv('UPLOAD_SESSION_MAX_AGE', 60 * 60 * 24))
+
 
 LOGIN_REDIRECT_URL = '/'
 LOGIN_URL = 'login'
@@ -154,15 +178,120 @@ SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = str(os.getenv('GOOGLE_KEY'))
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = str(os.getenv('GOOGLE_SECRET'))
 
 # email configs
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_USE_TLS = True
-EMAIL_PORT = 587
+# mail is queued in the database and sent by a background thread through
+# OUTBOX_BACKEND, see users/mail.py
+EMAIL_BACKEND = 'users.mail.OutboxBackend'
+OUTBOX_BACKEND = os.getenv('OUTBOX_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+# seconds between checks for retries and other workers' mail; 0 turns the
+# background sender off (run `manage.py sendoutbox` from cron instead)
+OUTBOX_SEND_INTERVAL = int(os.getenv('OUTBOX_SEND_INTERVAL', 60))
+OUTBOX_BATCH = int(os.getenv('OUTBOX_BATCH', 50))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+# seconds before the first retry; doubles each retry
+OUTBOX_RETRY_DELAY = int(os.getenv('OUTBOX_RETRY_DELAY', 60))
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))
 EMAIL_HOST_USER = str(os.getenv('EMAIL_USER'))
 EMAIL_HOST_PASSWORD = str(os.getenv('EMAIL_PASSWORD'))
 
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30
 
+# sessions are read from a cache shared by the workers of this host and
+# written through to the database, see users/sessions.py
+SESSION_ENGINE = 'users.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_CACHE_DIR = os.getenv(
+    'SESSION_CACHE_DIR',
+    '/dev/shm/user_management_sessions' if os.path.isdir('/dev/shm')
+    else os.path.join(BASE_DIR, 'cache', 'sessions'),
+)
+# seconds between sweeps of expired sessions in each worker; 0 turns the
+# background sweeper off (run `manage.py sweepsessions` from cron instead)
+SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', 60 * 60))
+SESSION_SWEEP_BATCH = int(os.getenv('SESSION_SWEEP_BATCH', 500))
+
+# signed-in users are loaded with their profile from a cache shared by the
+# workers of this host, see users/auth_cache.py
+USER_CACHE_ALIAS = 'users'
+USER_CACHE_DIR = os.getenv(
+    'USER_CACHE_DIR',
+    '/dev/shm/user_management_users' if os.path.isdir('/dev/shm')
+    else os.path.join(BASE_DIR, 'cache', 'users'),
+)
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', 60 * 60))
+
+# donation aggregates are cached where every worker sees them, see
+# users/donors.py; a timeout of 0 turns the cache off
+DONOR_CACHE_ALIAS = 'donors'
+DONOR_CACHE_DIR = os.getenv(
+    'DONOR_CACHE_DIR',
+    '/dev/shm/user_management_donors' if os.path.isdir('/dev/shm')
+    else os.path.join(BASE_DIR, 'cache', 'donors'),
+)
+DONOR_CACHE_TIMEOUT = int(os.getenv('DONOR_CACHE_TIMEOUT', 5 * 60))
+# rows validated and inserted at a time by `manage.py importdonors`
+DONOR_IMPORT_CHUNK = int(os.getenv('DONOR_IMPORT_CHUNK', 50000))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': SESSION_CACHE_DIR,
+        'TIMEOUT': SESSION_COOKIE_AGE,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('SESSION_CACHE_MAX_ENTRIES', 10000))},
+    },
+    'users': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': USER_CACHE_DIR,
+        'TIMEOUT': USER_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))},
+    },
+    'donors': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': DONOR_CACHE_DIR,
+        'TIMEOUT': DONOR_CACHE_TIMEOUT,
+    },
+}
+
+# avatar thumbnails are made on a background thread pool, see users/avatars.py
+AVATAR_WORKERS = int(os.getenv('AVATAR_WORKERS', 1))
+
+# reconciliation jobs run in a local process pool, see users/jobs.py
+RECON_WORKERS = int(os.getenv('RECON_WORKERS', 2))
+
+# parsed inputs are cached by content hash, see users/parse_cache.py
+RECON_CACHE_ENABLED = os.getenv('RECON_CACHE_ENABLED', 'true').lower() == 'true'
+RECON_CACHE_DIR = os.getenv('RECON_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'parsed'))
+RECON_CACHE_MAX_BYTES = int(os.getenv('RECON_CACHE_MAX_BYTES', 1024 ** 3))
+
+# threads loading the four inputs of a reconciliation at once; 1 loads
+# them one after the other, see users/recon.py
+RECON_LOAD_WORKERS = int(os.getenv('RECON_LOAD_WORKERS', 4))
+
+# 'auto' reads workbooks with calamine when installed, 'default' with
+# openpyxl/xlrd, 'calamine' requires it; see users/readers.py
+RECON_EXCEL_ENGINE = os.getenv('RECON_EXCEL_ENGINE', 'auto')
+
+# exact per-stage peak memory via tracemalloc; slow, see users/metrics.py
+RECON_TRACE_MEMORY = os.getenv('RECON_TRACE_MEMORY', 'false').lower() == 'true'
+# addresses allowed to read /metrics/ without a staff login
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'users': {'handlers': ['console'], 'level': os.getenv('USERS_LOG_LEVEL', 'INFO')},
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
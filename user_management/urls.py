@@ -1,13 +1,15 @@
+import re
+
 from django.contrib import admin
 
 from django.urls import path, include, re_path
 
 from django.conf import settings
-from django.conf.urls.static import static
 
 from django.contrib.auth import views as auth_views
 from users.views import CustomLoginView, ResetPasswordView, ChangePasswordView
 
+from users import media
 from users.forms import LoginForm
 
 urlpatterns = [
@@ -34,4 +36,6 @@ urlpatterns = [
 
     re_path(r'^oauth/', include('social_django.urls', namespace='social')),
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), media.serve, name='media'),
+
+]
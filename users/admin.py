@@ -1,4 +1,6 @@
 from django.contrib import admin
-from .models import Profile
+from .models import OutboxMessage, Profile, UploadSession
 
 admin.site.register(Profile)
+admin.site.register(OutboxMessage)
+admin.site.register(UploadSession)
@@ -0,0 +1,108 @@
+"""Signed-in user and profile loading through a shared cache.
+
+Django's ``AuthenticationMiddleware`` reads the ``User`` from the database
+on every request, and pages showing the avatar then read the ``Profile``.
+``AuthenticationMiddleware`` here loads the user with ``get_user``, which
+keeps the user, with its profile already attached, in the
+``USER_CACHE_ALIAS`` cache, so a signed-in page view makes no auth queries.
+
+Entries are versioned: the key of a user's entry holds a version stamp kept
+under its own key, and ``invalidate`` (called by the ``User`` and
+``Profile`` signals in ``users.signals``) replaces the stamp instead of
+deleting the entry. A request that read the old row while it was being
+changed can only write its entry under the old stamp, where nobody looks.
+Stamps are nanosecond times rather than counters, so a stamp lost from the
+cache is never reissued.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import middleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+# bump when what is cached changes shape
+FORMAT = 1
+
+
+class AuthenticationMiddleware(middleware.AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: _request_user(request))
+
+
+def get_user(request):
+    """``django.contrib.auth.get_user`` reading the user from the cache."""
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+
+    user = _load(user_id, backend_path)
+    # verify the session like auth.get_user does
+    if hasattr(user, "get_session_auth_hash"):
+        session_hash = request.session.get(auth.HASH_SESSION_KEY)
+        if not session_hash or not constant_time_compare(
+            session_hash, user.get_session_auth_hash()
+        ):
+            request.session.flush()
+            user = None
+    return user or AnonymousUser()
+
+
+def invalidate(user_id):
+    """Stop serving the cached entry of ``user_id``.
+
+    The stamp is replaced now and again once the current transaction
+    commits, so a request reading the row in between cannot cache it for
+    good.
+    """
+    _restamp(user_id)
+    transaction.on_commit(lambda: _restamp(user_id))
+
+
+def _request_user(request):
+    if not hasattr(request, "_cached_user"):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+def _load(user_id, backend_path):
+    cache = caches[settings.USER_CACHE_ALIAS]
+    stamp = cache.get(_stamp_key(user_id))
+    if stamp is None:
+        stamp = time.time_ns()
+        if not cache.add(_stamp_key(user_id), stamp, None):
+            stamp = cache.get(_stamp_key(user_id), stamp)
+    key = f"users.auth:{FORMAT}:{user_id}:{stamp}:{backend_path}"
+
+    user = cache.get(key)
+    if user is not None:
+        return user
+    user = auth.load_backend(backend_path).get_user(user_id)
+    if user is None:
+        return None
+    try:
+        # cached along with the user
+        user.profile
+    except ObjectDoesNotExist:
+        pass
+    cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
+
+
+def _restamp(user_id):
+    caches[settings.USER_CACHE_ALIAS].set(_stamp_key(user_id), time.time_ns(), None)
+
+
+def _stamp_key(user_id):
+    return f"users.auth:{FORMAT}:{user_id}:stamp"
@@ -0,0 +1,141 @@
+"""Avatar thumbnails, made in the background.
+
+``Profile.save`` used to decode the avatar and rewrite it on every save. Now
+it only calls ``schedule`` when the avatar file changed; once the save is
+committed a small thread pool decodes the image a single time (in draft mode
+for JPEGs, which lets libjpeg decode straight to a fraction of the full
+size), writes a WebP thumbnail for each of ``SIZES`` and stores their names
+and dimensions on the profile. Templates use ``thumbnail`` and never open
+the image.
+
+Thumbnails are named by the SHA-256 of the avatar, so profiles sharing an
+image (the default avatar, or the same file uploaded again) share them and
+only the first one pays for the encoding.
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from . import auth_cache
+
+logger = logging.getLogger(__name__)
+
+Thumbnail = namedtuple("Thumbnail", ["url", "width", "height", "srcset"])
+
+# longest side of each thumbnail, in pixels
+SIZES = (48, 100, 200)
+# size pages show the avatar at; the 2x size is used on high density screens
+DISPLAY_SIZE = 100
+DIRECTORY = "profile_images/thumbnails"
+QUALITY = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AVATAR_WORKERS, thread_name_prefix="avatars"
+            )
+        return _executor
+
+
+def schedule(profile):
+    """Make the thumbnails of ``profile``'s avatar once the save commits."""
+    manager = type(profile)._default_manager
+    pk, user_id, name = profile.pk, profile.user_id, profile.avatar.name
+    storage = profile.avatar.storage
+    transaction.on_commit(
+        lambda: get_executor().submit(_process, manager, pk, user_id, name, storage)
+    )
+
+
+def thumbnail(profile, size=DISPLAY_SIZE):
+    """Return the ``Thumbnail`` of ``profile``'s avatar at ``size``.
+
+    Until the thumbnails are made this is the original image, with no
+    dimensions.
+    """
+    made = profile.avatar_thumbnails.get(str(size))
+    if made is None:
+        return Thumbnail(profile.avatar.url, None, None, "")
+    storage = profile.avatar.storage
+    url = storage.url(made["name"])
+    srcset = f"{url} 1x"
+    double = profile.avatar_thumbnails.get(str(size * 2))
+    if double is not None:
+        srcset += f", {storage.url(double['name'])} 2x"
+    return Thumbnail(url, made["width"], made["height"], srcset)
+
+
+def make_thumbnails(storage, name):
+    """Write the thumbnails of the image ``name`` in ``storage``.
+
+    Returns the SHA-256 of the image and, by size, the name, width and
+    height of each thumbnail.
+    """
+    with storage.open(name) as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    names = {size: f"{DIRECTORY}/{digest[:2]}/{digest}-{size}.webp" for size in SIZES}
+
+    if all(storage.exists(path) for path in names.values()):
+        # made before for the same image; their headers give the sizes
+        thumbnails = {}
+        for size, path in names.items():
+            with storage.open(path) as f, Image.open(f) as thumb:
+                thumbnails[str(size)] = _entry(path, thumb.size)
+        return digest, thumbnails
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (max(SIZES), max(SIZES)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        thumbnails = {}
+        # largest first, each one shrinking the previous
+        for size in sorted(SIZES, reverse=True):
+            image.thumbnail((size, size))
+            buffer = io.BytesIO()
+            image.save(buffer, "WEBP", quality=QUALITY, method=4)
+            path = names[size]
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(buffer.getvalue()))
+            thumbnails[str(size)] = _entry(path, image.size)
+    return digest, thumbnails
+
+
+def _entry(path, size):
+    width, height = size
+    return {"name": path, "width": width, "height": height}
+
+
+def _process(manager, pk, user_id, name, storage):
+    close_old_connections()
+    try:
+        digest, thumbnails = make_thumbnails(storage, name)
+        # unless the avatar changed again in the meantime
+        updated = manager.filter(pk=pk, avatar=name).update(
+            avatar_digest=digest, avatar_thumbnails=thumbnails
+        )
+        if updated:
+            # update() sends no signals
+            auth_cache.invalidate(user_id)
+    except Exception:
+        logger.exception("Could not make thumbnails of avatar %s", name)
+    finally:
+        close_old_connections()
@@ -0,0 +1,178 @@
+"""Streaming donor import from CSV and Excel files.
+
+``import_donors`` reads a file ``DONOR_IMPORT_CHUNK`` rows at a time, so a
+file of millions of donors never sits in memory whole:
+
+* CSV files are read with ``pandas.read_csv(chunksize=...)``;
+* ``.xlsx`` workbooks are streamed row by row with openpyxl's read-only
+  mode;
+* legacy ``.xls`` workbooks hold at most 65,536 rows and are read at once.
+
+Each chunk is validated as whole columns: names are stripped and must be
+1 to 100 characters, donations lose thousands separators and must be
+numbers from 0 up to what ``Donor.donation`` holds. Valid rows are written
+with ``bulk_create`` in one transaction per chunk, so web workers waiting
+for the database lock never wait long. Rejected rows are counted and the
+first ``MAX_ERRORS`` are reported with their row in the file.
+"""
+
+import itertools
+import logging
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from . import donors, readers
+from .models import Donor
+
+logger = logging.getLogger(__name__)
+
+ImportResult = namedtuple("ImportResult", ["imported", "rejected", "errors"])
+
+# accepted headers, compared without case or surrounding spaces
+NAME_HEADERS = ("name", "donor", "donor name")
+DONATION_HEADERS = ("donation", "amount", "donation amount")
+
+MAX_ERRORS = 100
+
+_NAME_LENGTH = Donor._meta.get_field("name").max_length
+_DONATION_FIELD = Donor._meta.get_field("donation")
+_MAX_DONATION = 10 ** (_DONATION_FIELD.max_digits - _DONATION_FIELD.decimal_places)
+
+
+def import_donors(path, chunk_size=None, dry_run=False):
+    """Import the donors in the CSV or Excel file at ``path``.
+
+    With ``dry_run`` the rows are only validated. Returns an
+    ``ImportResult`` with the rows imported, the rows rejected and, for the
+    first ``MAX_ERRORS`` rejected rows, their row in the file and why.
+    """
+    chunk_size = chunk_size or settings.DONOR_IMPORT_CHUNK
+    imported = rejected = 0
+    errors = []
+    start = time.perf_counter()
+    for frame in _chunks(path, chunk_size):
+        valid, reasons = validate(frame)
+        rejected += len(reasons)
+        errors.extend(itertools.islice(reasons.items(), MAX_ERRORS - len(errors)))
+        if not dry_run and len(valid):
+            with transaction.atomic():
+                Donor.objects.bulk_create(
+                    Donor(name=name, donation=donation)
+                    for name, donation in zip(valid["name"], valid["donation"])
+                )
+            donors.invalidate()
+        imported += len(valid)
+    logger.info(
+        "Imported %s donors from %s in %.1fs, rejected %s",
+        imported,
+        path,
+        time.perf_counter() - start,
+        rejected,
+    )
+    return ImportResult(imported, rejected, errors)
+
+
+def validate(frame):
+    """Split a chunk of ``name`` and ``donation`` text into donors and rejects.
+
+    Returns the valid rows, with stripped names and donations rounded to
+    cents, and the reason each other row was rejected, indexed by its row
+    in the file.
+    """
+    names = frame["name"].astype("string").str.strip()
+    text = frame["donation"].astype("string").str.replace(r"[,\s]", "", regex=True)
+    amounts = pd.to_numeric(text, errors="coerce").round(2)
+
+    checks = [
+        names.isna() | (names == ""),
+        names.str.len() > _NAME_LENGTH,
+        amounts.isna(),
+        amounts < 0,
+        amounts >= _MAX_DONATION,
+    ]
+    reasons = np.select(
+        [check.fillna(False).to_numpy(dtype=bool) for check in checks],
+        [
+            "missing name",
+            f"name longer than {_NAME_LENGTH} characters",
+            "donation is not a number",
+            "negative donation",
+            f"donation of {_MAX_DONATION:,} or more",
+        ],
+        default="",
+    )
+    rejected = reasons != ""
+    valid = pd.DataFrame({"name": names[~rejected], "donation": amounts[~rejected]})
+    return valid, pd.Series(reasons[rejected], index=frame.index[rejected])
+
+
+def _chunks(path, chunk_size):
+    """Yield ``name`` and ``donation`` frames indexed by row in the file."""
+    try:
+        file_format = readers.detect(path)
+    except ValueError:
+        file_format = None
+
+    if file_format is None:
+        header = list(pd.read_csv(path, nrows=0).columns)
+        columns = _columns(path, header)
+        reader = pd.read_csv(
+            path,
+            usecols=columns,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=chunk_size,
+        )
+        for frame in reader:
+            yield _named(frame[columns], row=frame.index[0] + 2)
+    elif file_format == readers.XLS:
+        frame = readers.read_excel(path, dtype=str, keep_default_na=False)
+        columns = _columns(path, list(frame.columns))
+        for first in range(0, len(frame), chunk_size):
+            yield _named(frame[columns].iloc[first : first + chunk_size], row=first + 2)
+    else:
+        yield from _xlsx_chunks(path, chunk_size)
+
+
+def _xlsx_chunks(path, chunk_size):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = ["" if cell is None else str(cell) for cell in next(rows, ())]
+        positions = [header.index(column) for column in _columns(path, header)]
+        row = 2
+        while True:
+            batch = list(itertools.islice(rows, chunk_size))
+            if not batch:
+                return
+            yield _named(pd.DataFrame(batch).reindex(columns=positions), row)
+            row += len(batch)
+    finally:
+        workbook.close()
+
+
+def _columns(path, header):
+    """Return the name and donation headers of ``header``."""
+    found = []
+    for accepted in (NAME_HEADERS, DONATION_HEADERS):
+        matches = [c for c in header if str(c).strip().lower() in accepted]
+        if not matches:
+            raise ValueError(
+                f"{path} has no {accepted[0]} column; expected one of "
+                + ", ".join(accepted)
+            )
+        found.append(matches[0])
+    return found
+
+
+def _named(frame, row):
+    frame = frame.set_axis(["name", "donation"], axis=1)
+    # the header is row 1
+    return frame.set_axis(range(row, row + len(frame)), axis=0)
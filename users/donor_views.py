@@ -0,0 +1,32 @@
+"""JSON endpoints for the donation aggregates in ``users.donors``."""
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from . import donors
+from .forms import DonorQueryForm
+
+
+@login_required
+def donor_totals(request):
+    return JsonResponse(donors.totals())
+
+
+@login_required
+def donor_top(request):
+    form = DonorQueryForm(request.GET)
+    if not form.is_valid():
+        return _invalid(form)
+    return JsonResponse({"donors": donors.top(form.cleaned_data["n"] or 10)})
+
+
+@login_required
+def donor_distribution(request):
+    form = DonorQueryForm(request.GET)
+    if not form.is_valid():
+        return _invalid(form)
+    return JsonResponse({"buckets": donors.distribution(form.cleaned_data["bounds"])})
+
+
+def _invalid(form):
+    return JsonResponse({"errors": form.errors}, status=400)
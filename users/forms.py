@@ -1,7 +1,10 @@
+import math
+
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 
+from . import donors
 from .models import Profile
 
 
@@ -142,10 +145,15 @@ class UpdateProfileForm(forms.ModelForm):
         fields = ["avatar", "bio"]
 
 
-from .models import File, StatFile
+from .models import File, ReconLine, StatFile
 
 
 class FileForm(forms.ModelForm):
+    incremental = forms.BooleanField(
+        required=False,
+        help_text="Only reconcile entries not seen by earlier incremental runs",
+    )
+
     class Meta:
         model = File
         fields = ["Statement", "Cheques", "EFTs", "Direct_Debit"]
@@ -155,3 +163,91 @@ class StatForm(forms.ModelForm):
     class Meta:
         model = StatFile
         fields = ["pstatement"]
+
+
+class UploadStartForm(forms.Form):
+    """Starts a chunked upload, see users/uploads.py."""
+
+    filename = forms.CharField(max_length=255)
+    size = forms.IntegerField(min_value=1)
+    sha256 = forms.RegexField(
+        regex=r"^[0-9a-fA-F]{64}$",
+        required=False,
+        help_text="SHA-256 of the whole file, checked once it is uploaded",
+    )
+
+
+class UploadedFileForm(forms.Form):
+    """The files of a reconciliation, as ids of complete chunked uploads."""
+
+    Statement = forms.UUIDField()
+    Cheques = forms.UUIDField()
+    EFTs = forms.UUIDField()
+    Direct_Debit = forms.UUIDField()
+    incremental = forms.BooleanField(required=False)
+
+
+class UploadedStatForm(forms.Form):
+    pstatement = forms.UUIDField()
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+    def __init__(self, attrs=None):
+        super().__init__({"multiple": True, **(attrs or {})})
+
+    def value_from_datadict(self, data, files, name):
+        return files.getlist(name)
+
+
+class MultipleFileField(forms.FileField):
+    widget = MultipleFileInput
+
+    def clean(self, data, initial=None):
+        clean_one = super().clean
+        return [clean_one(item, initial) for item in data]
+
+
+class PeriodsForm(forms.Form):
+    statements = MultipleFileField(
+        help_text="Two or more statements, compared in file name order",
+    )
+
+    def clean_statements(self):
+        statements = self.cleaned_data["statements"]
+        if len(statements) < 2:
+            raise forms.ValidationError("Choose at least two statements.")
+        return sorted(statements, key=lambda statement: statement.name)
+
+
+class LineFilterForm(forms.Form):
+    category = forms.ChoiceField(
+        choices=[("", "All")] + ReconLine.CATEGORY_CHOICES, required=False
+    )
+    ft = forms.CharField(label="FT", max_length=32, required=False)
+    min_amount = forms.FloatField(required=False)
+    max_amount = forms.FloatField(required=False)
+
+
+class DonorQueryForm(forms.Form):
+    n = forms.IntegerField(min_value=1, max_value=1000, required=False)
+    bounds = forms.CharField(
+        required=False, help_text="Ascending bucket bounds, separated by commas"
+    )
+
+    def clean_bounds(self):
+        text = self.cleaned_data["bounds"]
+        if not text:
+            return donors.BUCKETS
+        try:
+            bounds = tuple(float(bound) for bound in text.split(","))
+        except ValueError:
+            raise forms.ValidationError("Give numbers separated by commas.")
+        if (
+            len(bounds) > 20
+            or not all(math.isfinite(bound) for bound in bounds)
+            or list(bounds) != sorted(set(bounds))
+        ):
+            raise forms.ValidationError("Give up to 20 ascending numbers.")
+        return bounds
@@ -0,0 +1,183 @@
+"""Local worker pool for reconciliation jobs.
+
+Each web process owns a small ``ProcessPoolExecutor``. A view creates a
+``ReconJob`` row, hands the work to the pool and returns straight away; the
+pool reports back through a future callback which records the outcome on the
+row, so any web process can answer status and download requests for it.
+
+A job whose web process dies before the job finishes would stay pending
+for good, so each job records the process that runs it (``worker_id``).
+``fail_orphaned`` fails the pending jobs of processes of this host that
+have gone; it runs when a process starts its pool, and ``fail_if_orphaned``
+checks single jobs when their status is read. When a pool worker dies, for
+instance killed for memory, the pool is broken: its jobs fail and the next
+job starts a new pool.
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import metrics, parse_cache, recon
+from .models import ReconJob
+
+logger = logging.getLogger(__name__)
+
+# job kind -> (pipeline, download file name)
+PIPELINES = {
+    ReconJob.RECON: (recon.reconcile, "Recon.xlsx"),
+    ReconJob.INCREMENTAL: (recon.reconcile_incremental, "Recon.xlsx"),
+    ReconJob.STAT: (recon.compare_statements, "Stat.xlsx"),
+    ReconJob.PERIODS: (recon.compare_periods, "Periods.xlsx"),
+    ReconJob.CLEARED_EFTS: (recon.cleared_efts, "Cleared_EFTs.xlsx"),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            fail_orphaned()
+            # spawn rather than fork: the web process has threads and open
+            # database connections that must not leak into the workers.
+            # Workers set Django up themselves; the incremental pipeline
+            # reads and writes the ledger.
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.RECON_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _executor
+
+
+def submit(kind, *inputs, user=None):
+    """Queue a reconciliation of ``inputs`` and return its ``ReconJob``."""
+    pipeline, filename = PIPELINES[kind]
+    job = ReconJob.objects.create(kind=kind, user=user, worker=worker_id())
+
+    output_dir = os.path.join(settings.MEDIA_ROOT, "reports")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{job.pk}-{filename}")
+
+    executor = get_executor()
+    try:
+        future = executor.submit(recon.run, pipeline, *inputs, output_path, job=job.pk)
+    except BrokenProcessPool:
+        _replace_executor(executor)
+        executor = get_executor()
+        future = executor.submit(recon.run, pipeline, *inputs, output_path, job=job.pk)
+    future.add_done_callback(lambda f: _finish(job.pk, output_path, f, executor))
+    return job
+
+
+def worker_id(pid=None):
+    """Return an id of process ``pid`` (this one by default) on this host."""
+    pid = pid or os.getpid()
+    return f"{socket.gethostname()}:{pid}:{_process_start(pid)}"
+
+
+def fail_orphaned():
+    """Fail the pending jobs of processes of this host that have gone."""
+    for job in ReconJob.objects.filter(status=ReconJob.PENDING).exclude(worker=""):
+        fail_if_orphaned(job)
+
+
+def fail_if_orphaned(job):
+    """Fail ``job`` if it is pending on a process of this host that has gone."""
+    if job.status != ReconJob.PENDING or not _orphaned(job):
+        return
+    error = "The process running this job stopped before it finished."
+    now = timezone.now()
+    # unless it finished meanwhile
+    if ReconJob.objects.filter(pk=job.pk, status=ReconJob.PENDING).update(
+        status=ReconJob.FAILED, error=error, finished_at=now
+    ):
+        logger.warning("Reconciliation job %s was orphaned by %s", job.pk, job.worker)
+        job.status, job.error, job.finished_at = ReconJob.FAILED, error, now
+        metrics.observe(job.kind, job.status, [], job=job.pk)
+
+
+def _orphaned(job):
+    host, _, pid = job.worker.partition(":")
+    pid = pid.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        # another host's job, which only that host can check
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    # the pid may belong to a process started since
+    return worker_id(int(pid)) != job.worker
+
+
+def _process_start(pid):
+    """Return when process ``pid`` started, or "" where that is unknown."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # starttime, counted after the command, which may hold spaces
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return ""
+
+
+def _replace_executor(broken):
+    """Have the next job start a new pool instead of the ``broken`` one."""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _finish(job_pk, output_path, future, executor):
+    close_old_connections()
+    try:
+        job = ReconJob.objects.get(pk=job_pk)
+        try:
+            summary, cache_counts, stages = future.result()
+        except Exception as exc:
+            if isinstance(exc, BrokenProcessPool):
+                _replace_executor(executor)
+            logger.error(
+                "Reconciliation job %s failed:\n%s",
+                job_pk,
+                "".join(traceback.format_exception(exc)),
+            )
+            job.status = ReconJob.FAILED
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.lines.all().delete()
+            metrics.observe(job.kind, job.status, [], job=job_pk)
+        else:
+            parse_cache.record(cache_counts)
+            job.status = ReconJob.DONE
+            job.summary = [[str(label), _jsonable(value)] for label, value in summary]
+            job.result.name = os.path.relpath(output_path, settings.MEDIA_ROOT)
+            job.metrics = stages
+            metrics.observe(job.kind, job.status, stages, job=job_pk)
+        job.finished_at = timezone.now()
+        job.save()
+    finally:
+        close_old_connections()
+
+
+def _jsonable(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
@@ -0,0 +1,225 @@
+"""Ledger of FT references seen by incremental reconciliations.
+
+The statement and clearing reports are month to date, so each day's upload
+repeats every row of the days before. ``LedgerEntry`` keeps, per account and
+FT, the statement and clearing rows that carried it and whether it is
+matched or still an open exception. ``recon.reconcile_incremental`` uses it
+to pick out the rows that are new since the last run (``unseen``), to bring
+open exceptions forward (``stored``) and, before the report is written, to
+record the run (``record``).
+
+``record`` reads the entries it changes again inside the transaction that
+writes them, which on SQLite starts with ``BEGIN IMMEDIATE`` and so holds
+the write lock, and elsewhere locks the rows. Incremental runs at the same
+time therefore each build on what the other saved, instead of creating the
+same entry twice or overwriting the other's counts.
+"""
+
+from collections import namedtuple
+
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LedgerEntry
+
+Changes = namedtuple("Changes", ["created", "updated", "closed"])
+
+# SQLite before 3.32 allows at most 999 parameters per query
+_BATCH = 900
+
+_FIELDS = [
+    "id",
+    "ft",
+    "status",
+    "statement_rows",
+    "statement_count",
+    "cleared_amounts",
+    "cleared_count",
+    "matched_at",
+]
+
+
+def load(account, keys):
+    """Return the entries of ``account`` for ``keys`` and all open exceptions.
+
+    The result maps FT to a dict of the entry's fields.
+    """
+    entries = LedgerEntry.objects.filter(account=account)
+    found = {
+        row["ft"]: row
+        for row in entries.exclude(status=LedgerEntry.MATCHED).values(*_FIELDS)
+    }
+    keys = list(keys)
+    for start in range(0, len(keys), _BATCH):
+        batch = entries.filter(
+            status=LedgerEntry.MATCHED, ft__in=keys[start : start + _BATCH]
+        )
+        found.update((row["ft"], row) for row in batch.values(*_FIELDS))
+    return found
+
+
+def record(account, statement, cleared, key="FT"):
+    """Add the new rows of a run to the ledger and return its ``Changes``.
+
+    ``statement`` and ``cleared`` are the rows ``unseen`` let through.
+    """
+    keys = set(statement[key].dropna()) | set(cleared[key].dropna())
+    with transaction.atomic():
+        entries = _locked(account, keys)
+        changes = diff(account, entries, statement, cleared, key)
+        save(changes)
+    return changes
+
+
+def open_keys(entries):
+    return {
+        ft for ft, entry in entries.items() if entry["status"] != LedgerEntry.MATCHED
+    }
+
+
+def unseen(frame, entries, count, key="FT"):
+    """Return a mask of the rows of ``frame`` with new occurrences of their key.
+
+    A key is new when ``frame`` has more rows for it than the ledger has
+    counted in ``count`` (``"statement_count"`` or ``"cleared_count"``).
+    Rows without a key cannot be tracked and always count as new.
+    """
+    keys = frame[key]
+    counts = keys.map(keys.value_counts())
+    seen = keys.map({ft: entry[count] for ft, entry in entries.items()}).fillna(0)
+    return ((counts > seen) | keys.isna()).to_numpy()
+
+
+def stored(entries, keys, side):
+    """Return report rows for the ``keys`` the ledger has seen on ``side``.
+
+    ``side`` is ``"statement"`` or ``"cleared"``; the rows have the columns
+    of the statement entries or of the cleared items respectively, one for
+    each row the ledger counted, so a reversal comes back with both legs.
+    """
+    rows = []
+    for ft in keys:
+        entry = entries.get(ft)
+        if entry is None:
+            continue
+        if side == "statement":
+            rows.extend(
+                (narration, ft, amount) for narration, amount in entry["statement_rows"]
+            )
+        else:
+            rows.extend((ft, amount) for amount in entry["cleared_amounts"])
+    columns = ["NARRATION", "FT", "AMOUNT"] if side == "statement" else ["FT", "AMOUNT"]
+    return pd.DataFrame(rows, columns=columns)
+
+
+def diff(account, entries, statement, cleared, key="FT"):
+    """Work out the ledger changes for the new rows of a run.
+
+    ``statement`` and ``cleared`` are the rows ``unseen`` let through.
+    Returns ``Changes`` holding the entries to create and to update and the
+    number of open exceptions the run matches.
+    """
+    statement = statement.dropna(subset=[key])
+    cleared = cleared.dropna(subset=[key])
+    statement_rows = {}
+    for ft, narration, amount in zip(
+        statement[key], statement["NARRATION"], statement["AMOUNT"]
+    ):
+        statement_rows.setdefault(ft, []).append([_text(narration), _amount(amount)])
+    cleared_amounts = {}
+    for ft, amount in zip(cleared[key], cleared["AMOUNT"]):
+        cleared_amounts.setdefault(ft, []).append(_amount(amount))
+    now = timezone.now()
+
+    created, updated, closed = [], [], 0
+    for ft in statement_rows.keys() | cleared_amounts.keys():
+        entry = entries.get(ft) or {
+            "status": None,
+            "statement_rows": [],
+            "statement_count": 0,
+            "cleared_amounts": [],
+            "cleared_count": 0,
+            "matched_at": None,
+        }
+        fields = {
+            "statement_rows": _latest(
+                statement_rows.get(ft, []), entry["statement_rows"]
+            ),
+            "cleared_amounts": _latest(
+                cleared_amounts.get(ft, []), entry["cleared_amounts"]
+            ),
+            "matched_at": entry["matched_at"],
+        }
+        fields["statement_count"] = len(fields["statement_rows"])
+        fields["cleared_count"] = len(fields["cleared_amounts"])
+        if fields["statement_count"] and fields["cleared_count"]:
+            fields["status"] = LedgerEntry.MATCHED
+        elif fields["statement_count"]:
+            fields["status"] = LedgerEntry.STATEMENT_ONLY
+        else:
+            fields["status"] = LedgerEntry.CLEARED_ONLY
+
+        matched = fields["status"] == LedgerEntry.MATCHED
+        if matched and entry["status"] != LedgerEntry.MATCHED:
+            fields["matched_at"] = now
+            if entry["status"] is not None:
+                closed += 1
+
+        if "id" in entry:
+            updated.append(
+                LedgerEntry(pk=entry["id"], account=account, ft=ft, **fields)
+            )
+        else:
+            created.append(LedgerEntry(account=account, ft=ft, **fields))
+    return Changes(created, updated, closed)
+
+
+def save(changes):
+    """Write ``Changes`` from ``diff`` to the ledger."""
+    with transaction.atomic():
+        LedgerEntry.objects.bulk_create(changes.created)
+        LedgerEntry.objects.bulk_update(
+            changes.updated,
+            [
+                "status",
+                "statement_rows",
+                "statement_count",
+                "cleared_amounts",
+                "cleared_count",
+                "matched_at",
+            ],
+        )
+
+
+def _locked(account, keys):
+    """Return the entries of ``account`` for ``keys``, locked for update."""
+    entries = LedgerEntry.objects.select_for_update().filter(account=account)
+    keys = list(keys)
+    found = {}
+    for start in range(0, len(keys), _BATCH):
+        batch = entries.filter(ft__in=keys[start : start + _BATCH])
+        found.update((row["ft"], row) for row in batch.values(*_FIELDS))
+    return found
+
+
+def _latest(new, stored):
+    """Return the rows of an FT to keep: the run's, unless the ledger has more.
+
+    A run that has rows for an FT has every row the report holds for it. The
+    reports are month to date, so rows only grow; a run that saw fewer rows
+    than a concurrent one saved leaves them be.
+    """
+    return new if len(new) >= len(stored) else stored
+
+
+def _text(value):
+    return "" if pd.isna(value) else str(value)[:64]
+
+
+def _amount(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(value) else value
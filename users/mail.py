@@ -0,0 +1,209 @@
+"""Outbound email through a database outbox.
+
+``PasswordResetView`` used to talk SMTP to the mail server inside the
+request, so a slow or unreachable server held the worker for as long as the
+connection took, and the response time told whether the address had an
+account.
+
+``OutboxBackend`` is the ``EMAIL_BACKEND``: it stores each message as an
+``OutboxMessage`` row, ready to go over SMTP, and returns. Once the request
+commits it wakes this process's sender thread, which claims the due
+messages ``OUTBOX_BATCH`` at a time and sends them through one connection
+of the ``OUTBOX_BACKEND`` (Django's SMTP backend by default). Sent messages
+are deleted. A message that fails is retried after ``OUTBOX_RETRY_DELAY``
+seconds, doubling each time, and marked failed after
+``OUTBOX_MAX_ATTEMPTS`` attempts. The thread also wakes every
+``OUTBOX_SEND_INTERVAL`` seconds for retries and for messages queued by
+other workers; ``manage.py sendoutbox`` sends them from cron instead.
+
+Claiming a message sets it to sending and leases it for ``LEASE``, so
+senders in several processes never pick the same message, and one whose
+sender died is sent again once the lease is over.
+"""
+
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import sanitize_address
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# how long a claimed message is left to its sender
+LEASE = timedelta(minutes=10)
+
+_sender = None
+_sender_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Queue messages in the outbox instead of sending them."""
+
+    def send_messages(self, email_messages):
+        rows = [_row(message) for message in email_messages if message.recipients()]
+        OutboxMessage.objects.bulk_create(rows)
+        if rows:
+            transaction.on_commit(wake)
+        return len(rows)
+
+
+def wake():
+    """Have this process's sender look for due messages now."""
+    start_sender()
+    _wakeup.set()
+
+
+def deliver(batch_size=None):
+    """Send the due messages, ``batch_size`` per connection.
+
+    Returns the number of messages sent.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH
+    sent = 0
+    while True:
+        messages = _claim(batch_size)
+        batch_sent = _send(messages)
+        sent += batch_sent
+        # stop at the end of the queue, or when nothing goes through
+        if len(messages) < batch_size or not batch_sent:
+            return sent
+
+
+def start_sender():
+    """Start this process's sender thread unless it runs already."""
+    global _sender
+    if _sender is not None or settings.OUTBOX_SEND_INTERVAL <= 0:
+        return
+    with _sender_lock:
+        if _sender is None:
+            _sender = threading.Thread(
+                target=_send_forever,
+                args=(settings.OUTBOX_SEND_INTERVAL,),
+                name="outbox-sender",
+                daemon=True,
+            )
+            _sender.start()
+
+
+class _StoredMessage(EmailMessage):
+    """An outbox row in the shape email backends send."""
+
+    def __init__(self, row):
+        super().__init__(row.subject, from_email=row.from_email, to=row.recipients)
+        self._data = bytes(row.message)
+
+    def message(self):
+        return _MIMEBytes(self._data)
+
+
+class _MIMEBytes:
+    def __init__(self, data):
+        self.data = data
+
+    def as_bytes(self, *args, **kwargs):
+        return self.data
+
+    def as_string(self, *args, **kwargs):
+        return self.data.decode("utf-8", "replace")
+
+
+def _row(message):
+    encoding = message.encoding or settings.DEFAULT_CHARSET
+    return OutboxMessage(
+        from_email=sanitize_address(message.from_email, encoding),
+        recipients=[
+            sanitize_address(address, encoding) for address in message.recipients()
+        ],
+        subject=str(message.subject)[:255],
+        message=message.message().as_bytes(linesep="\r\n"),
+    )
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboxMessage.PENDING, OutboxMessage.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+            status=OutboxMessage.SENDING, next_attempt_at=now + LEASE
+        )
+    return messages
+
+
+def _send(messages):
+    if not messages:
+        return 0
+    connection = get_connection(settings.OUTBOX_BACKEND)
+    sent = 0
+    try:
+        for index, message in enumerate(messages):
+            try:
+                # a no-op while the connection is open
+                connection.open()
+            except Exception as error:
+                # the server cannot be reached; try them all later
+                for unsent in messages[index:]:
+                    _retry_later(unsent, error)
+                break
+            try:
+                connection.send_messages([_StoredMessage(message)])
+            except Exception as error:
+                _close(connection)
+                _retry_later(message, error)
+            else:
+                message.delete()
+                sent += 1
+    finally:
+        _close(connection)
+    return sent
+
+
+def _retry_later(message, error):
+    message.attempts += 1
+    message.last_error = f"{type(error).__name__}: {error}"
+    if message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        message.status = OutboxMessage.FAILED
+        logger.error("Gave up sending %s: %s", message, message.last_error)
+    else:
+        message.status = OutboxMessage.PENDING
+        message.next_attempt_at = timezone.now() + timedelta(
+            seconds=settings.OUTBOX_RETRY_DELAY * 2 ** (message.attempts - 1)
+        )
+        logger.warning("Could not send %s: %s", message, message.last_error)
+    message.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def _send_forever(interval):
+    while True:
+        # spread the checks of workers started together
+        _wakeup.wait(interval * random.uniform(0.5, 1.5))
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            deliver()
+        except Exception:
+            logger.exception("Could not send the outbox")
+        finally:
+            close_old_connections()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users import donor_import
+
+
+class Command(BaseCommand):
+    help = "Import donors from a CSV or Excel file with name and donation columns."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="rows validated and inserted at a time (default: DONOR_IMPORT_CHUNK)",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="only validate the rows"
+        )
+
+    def handle(self, *args, path, chunk_size=None, dry_run=False, **options):
+        try:
+            result = donor_import.import_donors(path, chunk_size, dry_run)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        for row, reason in result.errors:
+            self.stderr.write(f"Row {row}: {reason}")
+        verb = "Validated" if dry_run else "Imported"
+        self.stdout.write(
+            f"{verb} {result.imported} donors, rejected {result.rejected} rows"
+        )
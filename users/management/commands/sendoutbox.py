@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users import mail
+
+
+class Command(BaseCommand):
+    help = "Send the queued emails that are due."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="messages sent per connection (default: OUTBOX_BATCH)",
+        )
+
+    def handle(self, *args, batch_size=None, **options):
+        sent = mail.deliver(batch_size)
+        self.stdout.write(f"Sent {sent} emails")
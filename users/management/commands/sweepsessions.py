@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users import sessions
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="sessions deleted per query (default: SESSION_SWEEP_BATCH)",
+        )
+
+    def handle(self, *args, batch_size=None, **options):
+        swept = sessions.sweep(batch_size)
+        self.stdout.write(f"Swept {swept} expired sessions")
@@ -0,0 +1,85 @@
+"""FT matching between statement entries and cleared items.
+
+``match`` factorizes the FT references of both sides into one hash index
+and classifies every row from the per-key counts, instead of running a
+merge for each direction and separate duplicate scans. Only the rows that
+actually matched are joined, to pair up their amounts.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Match = namedtuple(
+    "Match",
+    [
+        "matched",
+        "statement_only",
+        "cleared_only",
+        "amount_mismatches",
+        "statement_duplicates",
+        "cleared_duplicates",
+    ],
+)
+
+# Differences up to this amount are rounding, not a mismatch
+TOLERANCE = 0.5
+
+
+def match(statement, cleared, key="FT", tolerance=TOLERANCE):
+    """Match ``statement`` rows to ``cleared`` rows on ``key``.
+
+    Both frames need ``key`` and ``AMOUNT`` columns. The result frames keep
+    the layout of the left joins they replace:
+
+    * ``matched`` -- statement rows joined to their cleared rows (``AMOUNT_x``
+      from the statement, ``AMOUNT_y`` cleared) plus a ``Diff`` column.
+    * ``statement_only`` -- statement rows with no cleared row (T24
+      exceptions), with the cleared columns left empty.
+    * ``cleared_only`` -- cleared rows with no statement row (Chequepoint
+      exceptions); here ``AMOUNT_x`` is the cleared amount.
+    * ``amount_mismatches`` -- ``matched`` rows whose ``Diff`` exceeds
+      ``tolerance``.
+    * ``statement_duplicates`` / ``cleared_duplicates`` -- rows whose key
+      appears more than once on their own side. Only keys that look like FT
+      references count on the cleared side.
+    """
+    codes, uniques = pd.factorize(
+        pd.concat([statement[key], cleared[key]], ignore_index=True),
+        use_na_sentinel=False,
+    )
+    statement_codes = codes[: len(statement)]
+    cleared_codes = codes[len(statement) :]
+    statement_counts = np.bincount(statement_codes, minlength=len(uniques))
+    cleared_counts = np.bincount(cleared_codes, minlength=len(uniques))
+
+    statement_hit = cleared_counts[statement_codes] > 0
+    cleared_hit = statement_counts[cleared_codes] > 0
+
+    matched = pd.merge(
+        statement[statement_hit], cleared[cleared_hit], on=key, how="left"
+    )
+    matched["Diff"] = matched["AMOUNT_y"] - abs(matched["AMOUNT_x"])
+
+    statement_only = pd.merge(
+        statement[~statement_hit], cleared.iloc[:0], on=key, how="left"
+    )
+    cleared_only = pd.merge(
+        cleared[~cleared_hit], statement.iloc[:0], on=key, how="left"
+    )
+
+    statement_duplicates = statement[statement_counts[statement_codes] > 1]
+    cleared_duplicates = cleared[
+        (cleared_counts[cleared_codes] > 1)
+        & cleared[key].str.contains("FT", na=False).to_numpy(dtype=bool)
+    ]
+
+    return Match(
+        matched,
+        statement_only,
+        cleared_only,
+        matched.loc[abs(matched["Diff"]) > tolerance],
+        statement_duplicates,
+        cleared_duplicates,
+    )
@@ -0,0 +1,190 @@
+"""Media files, sent with validators and byte ranges or by the front-end server.
+
+``static()`` used to serve ``MEDIA_URL`` from a Python worker, only with
+``DEBUG`` on, with no ETag, caching headers or ranges. ``send`` answers
+conditional requests with ``304`` from a ``stat`` of the file. Otherwise:
+
+* with ``MEDIA_SENDFILE = "x-accel-redirect"`` (nginx) or ``"x-sendfile"``
+  (Apache, lighttpd) it returns an empty response whose header tells the
+  front-end server which file to send, so the worker never reads the file;
+* with ``"python"`` it streams the file itself, with an ETag,
+  ``Last-Modified`` and ``Accept-Ranges``, and answers a single byte range
+  with ``206``.
+
+``serve`` is the view behind ``MEDIA_URL``. It only serves ``PUBLIC``
+media: uploaded statements and reports are sent by the views that check who
+is asking for them.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from . import avatars
+
+# what MEDIA_URL serves to anyone
+PUBLIC = ("default.jpg", "profile_images/")
+# named after their contents, so they never change
+IMMUTABLE = (f"{avatars.DIRECTORY}/",)
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def serve(request, path):
+    """Send the public media file at ``path``."""
+    name = _public_name(path)
+    if name is None:
+        raise Http404
+    if name.startswith(IMMUTABLE):
+        cache_control = {
+            "public": True,
+            "max_age": IMMUTABLE_MAX_AGE,
+            "immutable": True,
+        }
+    else:
+        cache_control = {"public": True, "max_age": settings.MEDIA_MAX_AGE}
+    return send(request, name, cache_control=cache_control)
+
+
+def send(request, name, as_attachment=False, filename=None, cache_control=None):
+    """Return a response sending the file ``name`` under ``MEDIA_ROOT``.
+
+    ``cache_control`` is passed to ``patch_cache_control``; by default
+    browsers keep the file to themselves and check it is current before
+    using it again.
+    """
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+        stat_result = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    last_modified = int(stat_result.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _send_file(
+            request, name, path, stat_result.st_size, etag, last_modified
+        )
+        if as_attachment:
+            response["Content-Disposition"] = _attachment(
+                filename or os.path.basename(path)
+            )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(
+        response, **(cache_control or {"private": True, "no_cache": True})
+    )
+    return response
+
+
+def _public_name(path):
+    """Return ``path`` normalized, or None unless it is ``PUBLIC`` media."""
+    path = path.replace("\\", "/")
+    # "profile_images/../reports/..." would leave the public directories
+    if ".." in path.split("/"):
+        return None
+    name = posixpath.normpath(path).lstrip("/")
+    for public in PUBLIC:
+        if name == public or (public.endswith("/") and name.startswith(public)):
+            return name
+    return None
+
+
+def _send_file(request, name, path, size, etag, last_modified):
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if settings.MEDIA_SENDFILE == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(
+            name.replace(os.sep, "/")
+        )
+        return response
+    if settings.MEDIA_SENDFILE == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return response
+
+    response = _send_range(request, path, size, etag, last_modified, content_type)
+    if response is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _send_range(request, path, size, etag, last_modified, content_type):
+    """Return the ``206`` or ``416`` answer to a byte range request.
+
+    Returns None when the whole file should be sent: no ``Range`` header,
+    one this does not handle (several ranges, other units), or an
+    ``If-Range`` the file no longer matches.
+    """
+    match = _RANGE_RE.match(request.META.get("HTTP_RANGE", "").strip())
+    if not match:
+        return None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if (
+        if_range
+        and if_range != etag
+        and parse_http_date_safe(if_range) != last_modified
+    ):
+        return None
+
+    first, last = match.groups()
+    if first:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+        if last < first and first < size:
+            # invalid, so ignored
+            return None
+    elif last:
+        # the last ``last`` bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if first >= size or last < first:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    response = StreamingHttpResponse(
+        _read(path, first, last), status=206, content_type=content_type
+    )
+    response["Content-Length"] = last - first + 1
+    response["Content-Range"] = f"bytes {first}-{last}/{size}"
+    return response
+
+
+def _read(path, first, last):
+    with open(path, "rb") as f:
+        f.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _attachment(filename):
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        return f"attachment; filename*=utf-8''{quote(filename)}"
+    escaped = filename.replace("\\", "\\\\").replace('"', r"\"")
+    return f'attachment; filename="{escaped}"'
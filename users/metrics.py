@@ -0,0 +1,234 @@
+"""Per-stage timing and memory instrumentation for reconciliation jobs.
+
+Pipelines in ``users.recon`` wrap their parse, filter, join and sheet write
+steps in ``stage``. Inside ``recording`` (which ``recon.run`` sets up in the
+worker) every stage records its wall time, row count and the peak resident
+set size the worker process has reached so far. That is a high-water mark
+of the whole process, not what the stage used: a stage after a bigger one
+reports the bigger one's peak. With ``trace_memory`` it also records the
+peak memory allocated during the stage, measured with ``tracemalloc``; that is
+exact but slows pandas and openpyxl down several times over, so it is off
+unless ``RECON_TRACE_MEMORY`` is set. Outside of ``recording``, ``stage``
+costs next to nothing. The recorded stages
+travel back to the web process with the job result, where ``observe``
+logs them and adds them to the in-process histograms served by ``render``.
+"""
+
+import logging
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# upper bounds of the histogram buckets, in seconds and bytes
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(2**n for n in range(20, 34, 2))  # 1 MiB .. 8 GiB
+
+_recording = None
+_lock = threading.Lock()
+_histograms = {}
+_jobs = Counter()
+
+
+@contextmanager
+def recording(trace_memory=False):
+    """Collect the stages run inside the block into the yielded list."""
+    global _recording
+    stages = []
+    started = trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    # stages open in each thread, by thread id
+    _recording = (stages, {})
+    try:
+        yield stages
+    finally:
+        _recording = None
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def stage(name):
+    """Time the block as stage ``name``.
+
+    Yields a dict the block may set ``"rows"`` on.
+    """
+    entry = {"stage": name}
+    if _recording is None:
+        yield entry
+        return
+
+    stages, stacks = _recording
+    stack = stacks.setdefault(threading.get_ident(), [])
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    entry["peak"] = 0
+    stack.append(entry)
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry["seconds"] = time.perf_counter() - start
+        stack.pop()
+        if tracing:
+            # a nested stage resets the peak, so keep the larger of the two;
+            # stages running in other threads share the peak too
+            peak = max(tracemalloc.get_traced_memory()[1], entry["peak"])
+            entry["peak"] = peak
+            entry["peak_bytes"] = max(peak - base, 0)
+            for parent in stack:
+                parent["peak"] = max(parent["peak"], peak)
+        del entry["peak"]
+        if resource is not None:
+            entry["process_peak_rss_bytes"] = _process_peak_rss()
+        stages.append(entry)
+
+
+def annotate(**fields):
+    """Add ``fields`` to the innermost stage being recorded, if any."""
+    if _recording is not None:
+        stack = _recording[1].get(threading.get_ident())
+        if stack:
+            stack[-1].update(fields)
+
+
+def observe(kind, status, stages, job=None):
+    """Log the ``stages`` of a finished job and add them to the histograms."""
+    with _lock:
+        _jobs[kind, status] += 1
+        for entry in stages:
+            labels = (("kind", kind), ("stage", entry["stage"]))
+            _histogram("recon_stage_seconds", labels, SECONDS_BUCKETS).add(
+                entry["seconds"]
+            )
+            if "process_peak_rss_bytes" in entry:
+                _histogram("recon_process_peak_rss_bytes", labels, BYTES_BUCKETS).add(
+                    entry["process_peak_rss_bytes"]
+                )
+            if "peak_bytes" in entry:
+                _histogram("recon_stage_peak_bytes", labels, BYTES_BUCKETS).add(
+                    entry["peak_bytes"]
+                )
+
+    for entry in stages:
+        logger.info(
+            "recon stage job=%s kind=%s stage=%s seconds=%.3f rows=%s "
+            "process_peak_rss_bytes=%s peak_bytes=%s",
+            job,
+            kind,
+            entry["stage"],
+            entry["seconds"],
+            entry.get("rows", "-"),
+            entry.get("process_peak_rss_bytes", "-"),
+            entry.get("peak_bytes", "-"),
+            extra={"job": job, "kind": kind, **entry},
+        )
+
+
+def server_timing(stages):
+    """Format ``stages`` as a ``Server-Timing`` header value."""
+    return ", ".join(
+        '{};dur={:.1f};desc="{}"'.format(
+            re.sub(r"[^A-Za-z0-9_.-]", "_", entry["stage"]),
+            entry["seconds"] * 1000,
+            _description(entry).replace('"', "'"),
+        )
+        for entry in stages
+    )
+
+
+def _description(entry):
+    if "engine" in entry:
+        return f"{entry['stage']} ({entry['engine']})"
+    return entry["stage"]
+
+
+def render(cache_stats=None, session_stats=None):
+    """Return the metrics of this process in the Prometheus text format."""
+    lines = [
+        "# HELP recon_jobs_total Finished reconciliation jobs.",
+        "# TYPE recon_jobs_total counter",
+    ]
+    with _lock:
+        for (kind, status), count in sorted(_jobs.items()):
+            lines.append(f'recon_jobs_total{{kind="{kind}",status="{status}"}} {count}')
+
+        for name, help_text in (
+            ("recon_stage_seconds", "Wall time of reconciliation stages."),
+            (
+                "recon_process_peak_rss_bytes",
+                "Peak RSS of the worker process so far, after each stage.",
+            ),
+            ("recon_stage_peak_bytes", "Peak traced memory of reconciliation stages."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(_histograms.items()):
+                if metric == name:
+                    lines.extend(histogram.lines(name, labels))
+
+    if cache_stats is not None:
+        lines.append("# HELP recon_parse_cache_total Parse cache events.")
+        lines.append("# TYPE recon_parse_cache_total counter")
+        for event, count in cache_stats.items():
+            lines.append(f'recon_parse_cache_total{{event="{event}"}} {count}')
+
+    if session_stats is not None:
+        lines.append("# HELP sessions_total Session cache reads, writes and sweeps.")
+        lines.append("# TYPE sessions_total counter")
+        for event, count in session_stats.items():
+            lines.append(f'sessions_total{{event="{event}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def _process_peak_rss():
+    # kilobytes on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _histogram(name, labels, buckets):
+    key = (name, labels)
+    if key not in _histograms:
+        _histograms[key] = _Histogram(buckets)
+    return _histograms[key]
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0
+
+    def add(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{label_text},le="{bound}"}} {count}'
+        yield f'{name}_bucket{{{label_text},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{label_text}}} {self.sum}"
+        yield f"{name}_count{{{label_text}}} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_reconjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reconjob",
+            name="metrics",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:25
+
+from django.db import migrations, models
+import users.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_reconjob_metrics"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="file",
+            name="Cheques",
+            field=models.FileField(
+                storage=users.storage.ContentAddressedStorage(), upload_to="uploads"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="file",
+            name="Direct_Debit",
+            field=models.FileField(
+                storage=users.storage.ContentAddressedStorage(), upload_to="uploads"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="file",
+            name="EFTs",
+            field=models.FileField(
+                storage=users.storage.ContentAddressedStorage(), upload_to="uploads"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="file",
+            name="Statement",
+            field=models.FileField(
+                storage=users.storage.ContentAddressedStorage(), upload_to="uploads"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="statfile",
+            name="pstatement",
+            field=models.FileField(
+                storage=users.storage.ContentAddressedStorage(), upload_to="uploads"
+            ),
+        ),
+    ]
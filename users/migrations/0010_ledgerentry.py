@@ -0,0 +1,72 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0009_content_addressed_uploads"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("account", models.CharField(max_length=16)),
+                ("ft", models.CharField(max_length=32)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("statement_only", "T24 exception"),
+                            ("cleared_only", "CP exception"),
+                            ("matched", "Matched"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("narration", models.CharField(blank=True, max_length=64)),
+                ("statement_amount", models.FloatField(blank=True, null=True)),
+                ("statement_count", models.PositiveIntegerField(default=0)),
+                ("cleared_amount", models.FloatField(blank=True, null=True)),
+                ("cleared_count", models.PositiveIntegerField(default=0)),
+                ("first_seen", models.DateTimeField(auto_now_add=True)),
+                ("matched_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="reconjob",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("recon", "Reconciliation"),
+                    ("incremental", "Incremental reconciliation"),
+                    ("stat", "Statement comparison"),
+                    ("cleared_efts", "Cleared EFTs"),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ledgerentry",
+            index=models.Index(
+                fields=["account", "status"], name="users_ledge_account_06c782_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ledgerentry",
+            constraint=models.UniqueConstraint(
+                fields=("account", "ft"), name="unique_ledger_account_ft"
+            ),
+        ),
+    ]
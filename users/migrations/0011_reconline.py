@@ -0,0 +1,72 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_ledgerentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReconLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        choices=[
+                            ("t24", "T24 exception"),
+                            ("cp", "CP exception"),
+                            ("amount_check", "Amount check"),
+                            ("reversal", "Reversal from live"),
+                            ("cleared_duplicate", "Cleared duplicate"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("ft", models.CharField(blank=True, max_length=32)),
+                ("description", models.CharField(blank=True, max_length=64)),
+                ("amount", models.FloatField(blank=True, null=True)),
+                ("abs_amount", models.FloatField(blank=True, null=True)),
+                ("cleared_amount", models.FloatField(blank=True, null=True)),
+                ("diff", models.FloatField(blank=True, null=True)),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lines",
+                        to="users.reconjob",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="reconline",
+            index=models.Index(
+                fields=["job", "category", "abs_amount"],
+                name="users_recon_job_id_96116a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reconline",
+            index=models.Index(
+                fields=["job", "category", "ft"], name="users_recon_job_id_854003_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reconline",
+            index=models.Index(fields=["ft"], name="users_recon_ft_2db22d_idx"),
+        ),
+    ]
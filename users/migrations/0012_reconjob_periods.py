@@ -0,0 +1,27 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_reconline"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="reconjob",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("recon", "Reconciliation"),
+                    ("incremental", "Incremental reconciliation"),
+                    ("stat", "Statement comparison"),
+                    ("periods", "Multi-period statement comparison"),
+                    ("cleared_efts", "Cleared EFTs"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
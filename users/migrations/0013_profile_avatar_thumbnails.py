@@ -0,0 +1,23 @@
+# Generated by Django 4.1.2 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0012_reconjob_periods"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_digest",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_thumbnails",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.2 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0014_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="donor",
+            index=models.Index(
+                fields=["donation"], name="users_donor_donatio_4bba0f_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.2 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+def fail_pending(apps, schema_editor):
+    # jobs queued before jobs recorded their worker cannot be checked, and
+    # the restart that applies this migration has stopped them
+    ReconJob = apps.get_model("users", "ReconJob")
+    ReconJob.objects.filter(status="pending").update(
+        status="failed",
+        error="The process running this job stopped before it finished.",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0016_uploadsession"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reconjob",
+            name="worker",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(fail_pending, migrations.RunPython.noop),
+    ]
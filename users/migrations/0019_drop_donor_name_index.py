@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0018_upload_user"),
+    ]
+
+    operations = [
+        # 0015 used to add an index on Donor.name that no query reads; drop it
+        # where it was created
+        migrations.RunSQL(
+            "DROP INDEX IF EXISTS users_donor_name_779deb_idx",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.2 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+def to_rows(apps, schema_editor):
+    # only the first row of each side was kept before, so that is all an
+    # entry can carry forward until its FT is seen again
+    LedgerEntry = apps.get_model("users", "LedgerEntry")
+    for entry in LedgerEntry.objects.all().iterator():
+        if entry.statement_count:
+            entry.statement_rows = [[entry.narration, entry.statement_amount]]
+        if entry.cleared_count:
+            entry.cleared_amounts = [entry.cleared_amount]
+        entry.save(update_fields=["statement_rows", "cleared_amounts"])
+
+
+def from_rows(apps, schema_editor):
+    LedgerEntry = apps.get_model("users", "LedgerEntry")
+    for entry in LedgerEntry.objects.all().iterator():
+        if entry.statement_rows:
+            entry.narration, entry.statement_amount = entry.statement_rows[0]
+        if entry.cleared_amounts:
+            entry.cleared_amount = entry.cleared_amounts[0]
+        entry.save(update_fields=["narration", "statement_amount", "cleared_amount"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0019_drop_donor_name_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ledgerentry",
+            name="cleared_amounts",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="ledgerentry",
+            name="statement_rows",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(to_rows, from_rows),
+        migrations.RemoveField(
+            model_name="ledgerentry",
+            name="cleared_amount",
+        ),
+        migrations.RemoveField(
+            model_name="ledgerentry",
+            name="narration",
+        ),
+        migrations.RemoveField(
+            model_name="ledgerentry",
+            name="statement_amount",
+        ),
+    ]
@@ -1,6 +1,10 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
+from django.utils import timezone
+
+from . import avatars
 
 
 # Extending User Model Using a One-To-One Link
@@ -9,26 +13,84 @@ class Profile(models.Model):
 
     avatar = models.ImageField(default="default.jpg", upload_to="profile_images")
     bio = models.TextField()
+    # SHA-256 of the avatar and its thumbnails by size, see users/avatars.py
+    avatar_digest = models.CharField(max_length=64, blank=True)
+    avatar_thumbnails = models.JSONField(default=dict, blank=True)
+
+    # field values as last loaded or saved, empty for a new profile
+    _saved = {}
+    # whether this instance queued thumbnails that it has not seen yet
+    _thumbnails_pending = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved = instance._values()
+        return instance
 
     def __str__(self):
         return self.user.username
 
-    # resizing images
+    @property
+    def avatar_image(self):
+        """The avatar thumbnail pages show, an ``avatars.Thumbnail``."""
+        return avatars.thumbnail(self)
+
+    def changed_fields(self):
+        """Names of the fields changed since the profile was loaded or saved."""
+        saved = self._saved
+        return [
+            name
+            for name, value in self._values().items()
+            if name not in saved or saved[name] != value
+        ]
+
+    def _values(self):
+        deferred = self.get_deferred_fields()
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in deferred:
+                continue
+            value = getattr(self, field.attname)
+            # a file compares by the name it is stored under
+            values[field.attname] = value.name if field.name == "avatar" else value
+        return values
+
+    # thumbnails are only made again when the avatar changes
     def save(self, *args, **kwargs):
-        super().save()
+        update_fields = kwargs.get("update_fields")
+        if "avatar" in self.get_deferred_fields() or (
+            update_fields is not None and "avatar" not in update_fields
+        ):
+            changed = False
+        else:
+            changed = self.avatar.name != self._saved.get("avatar") or not (
+                self.avatar_thumbnails or self._thumbnails_pending
+            )
+        if changed:
+            self.avatar_digest = ""
+            self.avatar_thumbnails = {}
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields,
+                    "avatar_digest",
+                    "avatar_thumbnails",
+                }
 
-        img = Image.open(self.avatar.path)
+        super().save(*args, **kwargs)
 
-        if img.height > 100 or img.width > 100:
-            new_img = (100, 100)
-            img.thumbnail(new_img)
-            img.save(self.avatar.path)
+        self._saved = self._values()
+        if changed:
+            self._thumbnails_pending = True
+            avatars.schedule(self)
 
 
 from django.db import models
 import os
 from django.core.files.storage import FileSystemStorage
 
+from .storage import upload_storage
+
 """
 def upload_to(instance, filename):
     base_path = 'media/uploads'
@@ -43,6 +105,7 @@ def upload_to(instance, filename):
 """
 
 
+# kept for the migrations that still reference it
 def overwrite_upload_to(instance, filename):
     fs = FileSystemStorage()
     if fs.exists(filename):
@@ -51,19 +114,208 @@ def overwrite_upload_to(instance, filename):
 
 
 class File(models.Model):
-    Statement = models.FileField(upload_to=overwrite_upload_to)
-    Cheques = models.FileField(upload_to=overwrite_upload_to)
-    Direct_Debit = models.FileField(upload_to=overwrite_upload_to)
-    EFTs = models.FileField(upload_to=overwrite_upload_to)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    Statement = models.FileField(upload_to="uploads", storage=upload_storage)
+    Cheques = models.FileField(upload_to="uploads", storage=upload_storage)
+    Direct_Debit = models.FileField(upload_to="uploads", storage=upload_storage)
+    EFTs = models.FileField(upload_to="uploads", storage=upload_storage)
 
 
 class Donor(models.Model):
     name = models.CharField(max_length=100)
     donation = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        # top donations and distribution buckets are read off the donation
+        # index without touching the table
+        indexes = [models.Index(fields=["donation"])]
+
     def __str__(self):
         return self.name
 
 
 class StatFile(models.Model):
-    pstatement = models.FileField(upload_to=overwrite_upload_to)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    pstatement = models.FileField(upload_to="uploads", storage=upload_storage)
+
+
+class ReconJob(models.Model):
+    RECON = "recon"
+    INCREMENTAL = "incremental"
+    STAT = "stat"
+    PERIODS = "periods"
+    CLEARED_EFTS = "cleared_efts"
+    KIND_CHOICES = [
+        (RECON, "Reconciliation"),
+        (INCREMENTAL, "Incremental reconciliation"),
+        (STAT, "Statement comparison"),
+        (PERIODS, "Multi-period statement comparison"),
+        (CLEARED_EFTS, "Cleared EFTs"),
+    ]
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    result = models.FileField(upload_to="reports", blank=True)
+    summary = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    # per-stage seconds, rows and memory, see users/metrics.py
+    metrics = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # host, pid and start time of the web process running the job
+    worker = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+
+class LedgerEntry(models.Model):
+    """What incremental reconciliations have seen of one FT reference."""
+
+    STATEMENT_ONLY = "statement_only"
+    CLEARED_ONLY = "cleared_only"
+    MATCHED = "matched"
+    STATUS_CHOICES = [
+        (STATEMENT_ONLY, "T24 exception"),
+        (CLEARED_ONLY, "CP exception"),
+        (MATCHED, "Matched"),
+    ]
+
+    account = models.CharField(max_length=16)
+    ft = models.CharField(max_length=32)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    # [narration, amount] of each statement row with the FT
+    statement_rows = models.JSONField(default=list, blank=True)
+    statement_count = models.PositiveIntegerField(default=0)
+    # amount of each cleared item with the FT
+    cleared_amounts = models.JSONField(default=list, blank=True)
+    cleared_count = models.PositiveIntegerField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    matched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "ft"], name="unique_ledger_account_ft"
+            )
+        ]
+        indexes = [models.Index(fields=["account", "status"])]
+
+    def __str__(self):
+        return f"{self.account} {self.ft} ({self.status})"
+
+
+class ReconLine(models.Model):
+    """An exception or duplicate found by a reconciliation job."""
+
+    T24 = "t24"
+    CP = "cp"
+    AMOUNT_CHECK = "amount_check"
+    REVERSAL = "reversal"
+    CLEARED_DUPLICATE = "cleared_duplicate"
+    CATEGORY_CHOICES = [
+        (T24, "T24 exception"),
+        (CP, "CP exception"),
+        (AMOUNT_CHECK, "Amount check"),
+        (REVERSAL, "Reversal from live"),
+        (CLEARED_DUPLICATE, "Cleared duplicate"),
+    ]
+
+    job = models.ForeignKey(ReconJob, on_delete=models.CASCADE, related_name="lines")
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    ft = models.CharField(max_length=32, blank=True)
+    # narration on the statement, policy, batch or cheque number when cleared
+    description = models.CharField(max_length=64, blank=True)
+    amount = models.FloatField(null=True, blank=True)
+    abs_amount = models.FloatField(null=True, blank=True)
+    cleared_amount = models.FloatField(null=True, blank=True)
+    diff = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["job", "category", "abs_amount"]),
+            models.Index(fields=["job", "category", "ft"]),
+            models.Index(fields=["ft"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_category_display()} {self.ft} {self.amount}"
+
+
+class OutboxMessage(models.Model):
+    """An email waiting to be delivered, see users/mail.py.
+
+    Rows are deleted once their message is sent.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (FAILED, "Failed"),
+    ]
+
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    subject = models.CharField(max_length=255, blank=True)
+    # the MIME message as sent over SMTP
+    message = models.BinaryField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # when a pending message is due, or a sending one may be claimed again
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """A file sent in chunks, see users/uploads.py."""
+
+    UPLOADING = "uploading"
+    COMPLETE = "complete"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (UPLOADING, "Uploading"),
+        (COMPLETE, "Complete"),
+        (FAILED, "Failed"),
+    ]
+
+    # also the secret in the chunk URLs, so not a sequence
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # bytes received so far; chunks are appended in order
+    received = models.PositiveBigIntegerField(default=0)
+    # SHA-256 the client says the whole file has, checked at the end
+    expected_sha256 = models.CharField(max_length=64, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # the file in upload_storage once complete
+    name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "updated_at"])]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received} of {self.size} bytes)"
@@ -0,0 +1,169 @@
+"""On-disk cache of parsed reconciliation inputs.
+
+Operators upload the same statement and clearing workbooks several times a
+day. Entries are keyed by the SHA-256 of the uploaded bytes together with
+the kind of parse applied to them, so a repeat upload skips the Excel and
+fixed-width parsing entirely.
+
+Frames are stored as Parquet when pyarrow is installed and pickled
+otherwise (or when a column mixes types Parquet cannot hold). The cache
+directory is kept under ``RECON_CACHE_MAX_BYTES`` by evicting the least
+recently used entries.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = Counter()
+_COUNTERS_LOCK = threading.Lock()
+_HASH_BLOCK = 1 << 20
+
+
+def stats():
+    """Return the hit, miss, store and eviction counts of this process."""
+    return {name: _COUNTERS[name] for name in ("hits", "misses", "stores", "evictions")}
+
+
+def record(counts):
+    """Add ``counts`` (from ``stats()`` in another process) to this process."""
+    with _COUNTERS_LOCK:
+        _COUNTERS.update(counts)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load(path, kind, parse, version=1):
+    """Return ``parse(path)``, reusing an earlier result for the same bytes.
+
+    ``kind`` names the parse so different parses of one file do not collide;
+    bump ``version`` whenever ``parse`` changes what it returns. ``attrs`` on
+    the returned frame are kept.
+    """
+    if not settings.RECON_CACHE_ENABLED:
+        return parse(path)
+
+    key = f"{file_digest(path)}-{kind}-v{version}"
+    entry = _find(key)
+    if entry is not None:
+        try:
+            frame = _read(entry)
+        except Exception:
+            logger.warning("Dropping unreadable parse cache entry %s", entry)
+            _remove(entry)
+        else:
+            os.utime(entry)
+            _count("hits")
+            return frame
+
+    _count("misses")
+    frame = parse(path)
+    try:
+        _store(key, frame)
+    except OSError as exc:
+        logger.warning("Could not store parse cache entry %s: %s", key, exc)
+    return frame
+
+
+def _directory():
+    return str(settings.RECON_CACHE_DIR)
+
+
+def _bucket(key):
+    return os.path.join(_directory(), key[:2])
+
+
+def _find(key):
+    for suffix in (".parquet", ".pkl"):
+        entry = os.path.join(_bucket(key), key + suffix)
+        if os.path.exists(entry):
+            return entry
+    return None
+
+
+def _read(entry):
+    if entry.endswith(".parquet"):
+        return pd.read_parquet(entry)
+    return pd.read_pickle(entry)
+
+
+def _store(key, frame):
+    bucket = _bucket(key)
+    os.makedirs(bucket, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=bucket, suffix=".tmp")
+    os.close(fd)
+    try:
+        suffix = ".pkl"
+        if pyarrow is not None:
+            try:
+                frame.to_parquet(tmp)
+                suffix = ".parquet"
+            except (ValueError, TypeError, pyarrow.ArrowException):
+                pass
+        if suffix == ".pkl":
+            frame.to_pickle(tmp)
+        os.replace(tmp, os.path.join(bucket, key + suffix))
+    except BaseException:
+        _remove(tmp)
+        raise
+
+    _count("stores")
+    _evict()
+
+
+def _evict():
+    limit = settings.RECON_CACHE_MAX_BYTES
+    entries = []
+    total = 0
+    for root, _dirs, files in os.walk(_directory()):
+        for name in files:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    # least recently used first; hits refresh the mtime
+    for _mtime, size, path in sorted(entries):
+        if total <= limit:
+            break
+        _remove(path)
+        total -= size
+        _count("evictions")
+
+
+def _count(name):
+    # inputs are loaded from several threads at once, see recon.load_recon_inputs
+    with _COUNTERS_LOCK:
+        _COUNTERS[name] += 1
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,148 @@
+"""Comparison of a run of T24 statements, period by period.
+
+``stat`` compares two statements with a merge on FT. To compare a month of
+daily statements ``compare`` takes all of them at once: their entries go
+into one index keyed on FT with a column of amounts per period, and the
+changes between every pair of consecutive periods are read off that index
+in one pass, as are the balance roll-forward checks.
+
+The statements are month to date, like the ones ``stat`` compares, so
+between two periods the closing balance should move by the net of the
+entries that appeared, disappeared or changed amount.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .statement import parse_amount
+
+Period = namedtuple("Period", ["label", "entries", "balance"])
+Comparison = namedtuple("Comparison", ["changes", "rollforward"])
+
+APPEARED = "APPEARED"
+DISAPPEARED = "DISAPPEARED"
+CHANGED = "AMOUNT CHANGED"
+
+# amounts are in cents, smaller differences are rounding
+TOLERANCE = 0.005
+
+CHANGE_COLUMNS = [
+    "PERIOD",
+    "CHANGE",
+    "FT",
+    "NARRATION",
+    "PREVIOUS AMOUNT",
+    "AMOUNT",
+    "DIFF",
+]
+
+
+def build_index(periods):
+    """Return the FT-keyed amounts of ``periods`` and the narration of each FT.
+
+    The amounts frame has one column per period, numbered in order; an FT
+    missing from a period is NaN there. Entries sharing an FT within a
+    period are added up. Entries without an FT cannot be followed from one
+    period to the next and are left out.
+    """
+    frames = []
+    for number, period in enumerate(periods):
+        entries = period.entries.dropna(subset=["FT"])
+        frames.append(entries[["FT", "NARRATION", "AMOUNT"]].assign(PERIOD=number))
+    entries = pd.concat(frames, ignore_index=True)
+
+    amounts = (
+        entries.groupby(["FT", "PERIOD"])["AMOUNT"]
+        .sum()
+        .unstack("PERIOD")
+        .reindex(columns=range(len(periods)))
+    )
+    # the latest narration of each FT
+    narrations = entries.drop_duplicates("FT", keep="last").set_index("FT")["NARRATION"]
+    return amounts, narrations
+
+
+def compare(periods):
+    """Compare each of ``periods`` with the one before it.
+
+    Returns a ``Comparison`` of two frames: ``changes``, one row per entry
+    that appeared, disappeared or changed amount, and ``rollforward``, one
+    row per period with its balance check and change counts.
+    """
+    amounts, narrations = build_index(periods)
+    values = amounts.to_numpy(dtype=float)
+    previous, current = values[:, :-1], values[:, 1:]
+    had, has = ~np.isnan(previous), ~np.isnan(current)
+
+    masks = {
+        APPEARED: ~had & has,
+        DISAPPEARED: had & ~has,
+        CHANGED: had & has & (np.abs(current - previous) >= TOLERANCE),
+    }
+
+    labels = np.array([period.label for period in periods], dtype=object)
+    fts = amounts.index.to_numpy()
+    frames = []
+    for change, mask in masks.items():
+        rows, columns = np.nonzero(mask)
+        before, after = previous[rows, columns], current[rows, columns]
+        frames.append(
+            pd.DataFrame(
+                {
+                    "PERIOD": columns + 1,
+                    "CHANGE": change,
+                    "FT": fts[rows],
+                    "PREVIOUS AMOUNT": before,
+                    "AMOUNT": after,
+                    "DIFF": np.nan_to_num(after) - np.nan_to_num(before),
+                }
+            )
+        )
+    changes = pd.concat(frames, ignore_index=True)
+    changes["NARRATION"] = changes["FT"].map(narrations)
+    changes = changes.sort_values(["PERIOD", "CHANGE", "FT"], kind="stable")
+    changes["PERIOD"] = labels[changes["PERIOD"].to_numpy()]
+
+    counts = {
+        change: np.concatenate([[0], mask.sum(axis=0)])
+        for change, mask in masks.items()
+    }
+    return Comparison(
+        changes[CHANGE_COLUMNS].reset_index(drop=True),
+        _rollforward(periods, labels, counts),
+    )
+
+
+def _rollforward(periods, labels, counts):
+    totals = np.array([period.entries["AMOUNT"].sum() for period in periods])
+    balances = np.array([_balance(period.balance) for period in periods])
+    balance_movement = np.concatenate([[np.nan], np.diff(balances)])
+    entry_movement = np.concatenate([[np.nan], np.diff(totals)])
+    difference = balance_movement - entry_movement
+
+    rollforward = pd.DataFrame(
+        {
+            "PERIOD": labels,
+            "ENTRIES": [len(period.entries) for period in periods],
+            "ENTRIES TOTAL": totals,
+            "BALANCE": balances,
+            "BALANCE MOVEMENT": balance_movement,
+            "ENTRY MOVEMENT": entry_movement,
+            "DIFFERENCE": difference,
+        }
+    )
+    for change, count in counts.items():
+        rollforward[change] = count
+    rollforward["ROLLS FORWARD"] = np.where(np.abs(difference) < TOLERANCE, "YES", "NO")
+    rollforward.loc[np.isnan(balance_movement), "ROLLS FORWARD"] = "NO BALANCE"
+    # the first period has nothing to roll forward from
+    rollforward.loc[0, "ROLLS FORWARD"] = ""
+    return rollforward
+
+
+def _balance(value):
+    if value is None:
+        return np.nan
+    return parse_amount(value)
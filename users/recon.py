@@ -0,0 +1,518 @@
+"""Reconciliation pipelines.
+
+These functions hold the work that used to run inside the ``read``, ``stat``
+and ``my_view`` requests. They only deal with files on disk so they can run
+in a worker process (see ``users.jobs``) without touching the request.
+"""
+
+import logging
+import os
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import pandas as pd
+from django.conf import settings
+
+from . import ledger, metrics, parse_cache, periods, readers, results, sources
+from .matching import match
+from .models import ReconLine
+from .reports import ReportWriter
+from .statement import ACCOUNT, BALANCE_LABEL, Statement, parse_statement
+
+pd.options.mode.chained_assignment = None  # default='warn'
+
+logger = logging.getLogger(__name__)
+
+# clearing items paid to these banks are settled outside of Chequepoint
+EXCLUDED_BANKS = ["NCBA BANK KENYA PLC", "NIC BANK PLC"]
+
+
+def run(pipeline, *args, job=None):
+    """Run ``pipeline`` and return its result, parse cache counts and stages.
+
+    Exceptions the pipeline finds are stored as lines of the ``ReconJob``
+    with pk ``job``.
+    """
+    before = parse_cache.stats()
+    with metrics.recording(settings.RECON_TRACE_MEMORY) as stages, results.saving(job):
+        result = pipeline(*args)
+    after = parse_cache.stats()
+    return result, {name: after[name] - before[name] for name in after}, stages
+
+
+def load_statement(path):
+    """``parse_statement`` through the parse cache."""
+
+    def parse(path):
+        entries, balance = parse_statement(path)
+        entries.attrs["balance"] = balance
+        return entries
+
+    entries = parse_cache.load(path, "statement", parse)
+    return Statement(entries, entries.attrs.get("balance"))
+
+
+# columns of the cleared EFT export
+CLEARED_EFT_COLUMNS = [
+    "CUSTACCOUNT",
+    "CUSTNAME",
+    "DESTBANK",
+    "DESTBRANCH",
+    "DESTACCOUNT",
+    "DESTACCTITLE",
+    "TRNREF",
+    "AMOUNT",
+    "VALUEDATE",
+    "REMARKS",
+    "ENDTOENDID",
+]
+
+
+def read_text(path):
+    """Read the cleared EFT export columns of a workbook as text."""
+    frame = readers.read_excel(
+        path, index_col=False, dtype="str", usecols=CLEARED_EFT_COLUMNS
+    )
+    frame["CUSTACCOUNT"] = frame["CUSTACCOUNT"].map(str)
+    frame["DESTACCOUNT"] = frame["DESTACCOUNT"].map(str)
+    return frame
+
+
+def filter_direct_debits(DDrawreport):
+    """Return the cleared DDs and their ``POLICY1``/``FT``/``AMOUNT`` frame."""
+    DDreport = DDrawreport[
+        (
+            DDrawreport["STATUSID"].isin([1])
+            & (~DDrawreport["DESTBANK"].isin(EXCLUDED_BANKS))
+        )
+    ]
+    DDdf = DDreport[["POLICY1", "FTREFERENCE", "AMOUNT"]]
+    DDdf.columns = ["POLICY1", "FT", "AMOUNT"]
+    DDdf["AMOUNT"] = DDdf["AMOUNT"].astype(float)
+    return DDreport, DDdf
+
+
+def filter_efts(EFTdata):
+    """Return the ``ACHBULKID``/``FT``/``AMOUNT`` frame of the EFT report."""
+    EFTdf = EFTdata[["ACHBULKID", "TRNREF", "AMOUNT"]]
+    EFTdf.columns = ["ACHBULKID", "FT", "AMOUNT"]
+    # EFTdf ['AMOUNT'] = EFTdf ['AMOUNT'].astype(float)
+    return EFTdf
+
+
+def filter_cheques(CHQraw):
+    """Return the cleared cheques and their ``CHEQUENO``/``FT``/``AMOUNT`` frame."""
+    if "STATUSID" in CHQraw:
+        logger.debug("The cheque report has a STATUSID column")
+        CHQs = CHQraw[
+            (
+                CHQraw["STATUSID"].isin([1])
+                & (~CHQraw["DESTBANK"].isin(EXCLUDED_BANKS))
+                & (CHQraw["STAGE"].isin(["ACH CREATION", "COMPLETE"]))
+            )
+        ]
+    else:
+        logger.debug("The cheque report has no STATUSID column")
+        CHQs = CHQraw[
+            (~CHQraw["DESTBANK"].isin(EXCLUDED_BANKS))
+            & (CHQraw["STAGE"].isin(["ACH CREATION"]))
+        ]
+
+    if CHQs["CBS_REJECT_REASON"].str.contains("NOCREDIT").any():
+        logger.debug("The cheque report has NOCREDIT duplicates")
+        CHQdf = CHQs[["CHEQUENO", "CBS_REJECT_REASON", "AMOUNT"]]
+        CHQdf[["FT", "FT1", "FT2"]] = CHQdf.CBS_REJECT_REASON.str.split(
+            "[,-]", expand=True
+        )
+        CHQclr = CHQdf[["CHEQUENO", "FT1", "AMOUNT"]]
+        CHQclr.columns = ["CHEQUENO", "FT", "AMOUNT"]
+    else:
+        CHQdf = CHQs[["CHEQUENO", "CBS_REJECT_REASON", "AMOUNT"]]
+        CHQdf[["FT", "FT1"]] = CHQdf.CBS_REJECT_REASON.str.split("[,]", expand=True)
+        CHQclr = CHQdf[["CHEQUENO", "FT1", "AMOUNT"]]
+        CHQclr.columns = ["CHEQUENO", "FT", "AMOUNT"]
+        logger.debug("The cheque report has no NOCREDIT duplicates")
+    return CHQs, CHQclr
+
+
+def reconcile(statement, cheques, direct_debit, efts, output_path):
+    """Reconcile a T24 statement against the cleared DDs, EFTs and cheques.
+
+    Writes the Recon workbook to ``output_path`` and returns the summary rows.
+    """
+    cleandf, val, DDtable, EFTtable, CHQtable = load_recon_inputs(
+        statement, cheques, direct_debit, efts
+    )
+
+    sheets, summarydata, result = build_recon(cleandf, val, DDtable, EFTtable, CHQtable)
+    write_report(output_path, sheets)
+    save_lines(result)
+
+    return summarydata
+
+
+class InputError(ValueError):
+    """An upload of a reconciliation could not be loaded."""
+
+    def __init__(self, label, path, error):
+        # keep every argument in args so the error pickles back from a worker
+        super().__init__(label, path, str(error))
+        self.label = label
+        self.path = path
+
+    def __str__(self):
+        label, path, error = self.args
+        return f"Could not read the {label} upload {os.path.basename(path)}: {error}"
+
+
+def _load_balanced_statement(path):
+    statement = load_statement(path)
+    if statement.balance is None:
+        raise ValueError(f"no {BALANCE_LABEL} row")
+    return statement
+
+
+# label and loader of each reconciliation input, by stage name
+_INPUTS = {
+    "statement": ("statement", _load_balanced_statement),
+    "direct_debit": (
+        "direct debits",
+        lambda path: sources.load(path, sources.DIRECT_DEBITS),
+    ),
+    "efts": ("EFTs", lambda path: sources.load(path, sources.EFTS)),
+    "cheques": ("cheques", lambda path: sources.load(path, sources.CHEQUES)),
+}
+
+
+def load_recon_inputs(statement, cheques, direct_debit, efts):
+    """Parse the four uploads of a reconciliation through the parse cache.
+
+    The uploads are loaded at the same time on up to ``RECON_LOAD_WORKERS``
+    threads. The first upload that fails to load is raised as an
+    ``InputError``; loads not started yet are cancelled and those already
+    running are left to finish in the background.
+
+    Returns the statement entries, the closing balance and the
+    ``sources.Table`` of each clearing report.
+    """
+    paths = {
+        "statement": statement,
+        "direct_debit": direct_debit,
+        "efts": efts,
+        "cheques": cheques,
+    }
+    workers = max(1, min(settings.RECON_LOAD_WORKERS, len(paths)))
+    executor = ThreadPoolExecutor(workers, thread_name_prefix="recon-load")
+    try:
+        futures = {
+            executor.submit(_load_input, name, path): name
+            for name, path in paths.items()
+        }
+        done, _pending = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        loaded = {futures[future]: future.result() for future in futures}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    cleandf, val = loaded["statement"]
+    return cleandf, val, loaded["direct_debit"], loaded["efts"], loaded["cheques"]
+
+
+def _load_input(name, path):
+    label, loader = _INPUTS[name]
+    with metrics.stage(f"parse.{name}") as stage:
+        try:
+            loaded = loader(path)
+        except Exception as exc:
+            raise InputError(label, path, exc) from exc
+        # the frame comes first in both Statement and sources.Table
+        stage["rows"] = len(loaded[0])
+    return loaded
+
+
+def build_recon(cleandf, val, DDtable, EFTtable, CHQtable):
+    """Filter and match the parsed inputs of a reconciliation.
+
+    Returns the ``(sheet name, frame)`` pairs of the Recon workbook, the
+    summary rows and the ``Match``. The frames of the clearing report
+    sheets are functions loading them full width.
+    """
+    logger.debug("Statement entries:\n%s", cleandf.head(2))
+
+    with metrics.stage("filter") as stage:
+        postivesum = cleandf[cleandf["AMOUNT"] > 0]["AMOUNT"].sum()
+        negativesum = cleandf[cleandf["AMOUNT"] < 0]["AMOUNT"].sum()
+
+        DDreport, DDdf = filter_direct_debits(DDtable.frame)
+        DDsum = DDdf["AMOUNT"].sum()
+
+        EFTdf = filter_efts(EFTtable.frame)
+        EFTsum = EFTdf["AMOUNT"].sum()
+
+        CHQs, CHQclr = filter_cheques(CHQtable.frame)
+        CHQsum = CHQclr["AMOUNT"].sum()
+        stage["rows"] = len(DDdf) + len(EFTdf) + len(CHQclr)
+
+    logger.debug("Cleared cheques:\n%s", CHQclr.head(2))
+
+    with metrics.stage("join") as stage:
+        frames = [DDdf, EFTdf, CHQclr]
+
+        allcleared = pd.concat(frames)
+
+        result = match(cleandf, allcleared)
+        stage["rows"] = len(result.matched)
+
+    totaldebits = DDsum + CHQsum
+    summarydata = [
+        ["TOTAL STATEMENT CREDITS", postivesum],
+        ["TOTAL STATEMENT DEBITS", negativesum],
+        ["DIRECT DEBITS", DDsum],
+        ["CHEQUES", CHQsum],
+        ["EFTs", EFTsum],
+        ["TOTAL DEBITS CLEARED", totaldebits],
+        ["BALANCE AT THE END", val],
+    ]
+    summarydf = pd.DataFrame(summarydata, columns=["DESCRIPTION", "AMOUNT"])
+
+    sheets = recon_sheets(
+        cleandf,
+        allcleared,
+        result,
+        summarydf,
+        sources.rows(DDtable, DDreport.index),
+        EFTtable.full,
+        sources.rows(CHQtable, CHQs.index),
+    )
+    return sheets, summarydata, result
+
+
+def recon_sheets(cleandf, allcleared, result, summarydf, DDreport, EFTdata, CHQs):
+    """Return the ``(sheet name, frame)`` pairs of the Recon workbook."""
+    return [
+        ("Statement", cleandf),
+        ("Cleared", allcleared),
+        ("T24 Exceptions", result.statement_only),
+        ("CP Exceptions", result.cleared_only),
+        ("Summary", summarydf),
+        ("DDS", DDreport),
+        ("EFTs", EFTdata),
+        ("CHQs", CHQs),
+        ("REVERSALS FROM LIVE", result.statement_duplicates),
+        ("AMOUNT_CHECK", result.amount_mismatches),
+        ("CLEARED DUPLICATE", result.cleared_duplicates),
+    ]
+
+
+def reconcile_incremental(
+    statement, cheques, direct_debit, efts, output_path, account=ACCOUNT
+):
+    """Reconcile only the rows earlier incremental runs have not seen.
+
+    Rows whose FT the ledger has already counted are skipped, open
+    exceptions of earlier runs are carried forward and closed when their
+    match arrives. The ledger is updated first, and the Recon workbook then
+    lists the new rows and every open exception. Returns the summary rows.
+    """
+    cleandf, val, DDtable, EFTtable, CHQtable = load_recon_inputs(
+        statement, cheques, direct_debit, efts
+    )
+
+    with metrics.stage("filter") as stage:
+        postivesum = cleandf[cleandf["AMOUNT"] > 0]["AMOUNT"].sum()
+        negativesum = cleandf[cleandf["AMOUNT"] < 0]["AMOUNT"].sum()
+
+        DDreport, DDdf = filter_direct_debits(DDtable.frame)
+        DDsum = DDdf["AMOUNT"].sum()
+
+        EFTdf = filter_efts(EFTtable.frame)
+        EFTsum = EFTdf["AMOUNT"].sum()
+
+        CHQs, CHQclr = filter_cheques(CHQtable.frame)
+        CHQsum = CHQclr["AMOUNT"].sum()
+
+        allcleared = pd.concat([DDdf, EFTdf, CHQclr])
+        stage["rows"] = len(allcleared)
+
+    with metrics.stage("ledger.load") as stage:
+        entries = ledger.load(
+            account, pd.concat([cleandf["FT"], allcleared["FT"]]).dropna().unique()
+        )
+        stage["rows"] = len(entries)
+
+    with metrics.stage("join") as stage:
+        new_statement = cleandf[ledger.unseen(cleandf, entries, "statement_count")]
+        new_mask = ledger.unseen(allcleared, entries, "cleared_count")
+        new_cleared = allcleared[new_mask]
+
+        # bring in what earlier runs saw of every key this run touches
+        new_statement_keys = set(new_statement["FT"].dropna())
+        new_cleared_keys = set(new_cleared["FT"].dropna())
+        keys = ledger.open_keys(entries) | new_statement_keys | new_cleared_keys
+        statement_side = _extend(
+            new_statement,
+            ledger.stored(entries, keys - new_statement_keys, "statement"),
+        )
+        cleared_side = _extend(
+            new_cleared, ledger.stored(entries, keys - new_cleared_keys, "cleared")
+        )
+
+        result = match(statement_side, cleared_side)
+        stage["rows"] = len(new_statement) + len(new_cleared)
+
+    # before the report, so a report is only written for a run the ledger took
+    with metrics.stage("ledger.save") as stage:
+        changes = ledger.record(account, new_statement, new_cleared)
+        stage["rows"] = len(changes.created) + len(changes.updated)
+
+    summarydata = [
+        ["TOTAL STATEMENT CREDITS", postivesum],
+        ["TOTAL STATEMENT DEBITS", negativesum],
+        ["DIRECT DEBITS", DDsum],
+        ["CHEQUES", CHQsum],
+        ["EFTs", EFTsum],
+        ["TOTAL DEBITS CLEARED", DDsum + CHQsum],
+        ["BALANCE AT THE END", val],
+        ["NEW STATEMENT ENTRIES", len(new_statement)],
+        ["NEW CLEARED ITEMS", len(new_cleared)],
+        ["EXCEPTIONS CLOSED", changes.closed],
+        ["OPEN T24 EXCEPTIONS", len(result.statement_only)],
+        ["OPEN CP EXCEPTIONS", len(result.cleared_only)],
+    ]
+    summarydf = pd.DataFrame(summarydata, columns=["DESCRIPTION", "AMOUNT"])
+
+    # the clearing reports line up with their rows in allcleared
+    dd_end = len(DDdf)
+    eft_end = dd_end + len(EFTdf)
+    sheets = recon_sheets(
+        new_statement,
+        new_cleared,
+        result,
+        summarydf,
+        sources.rows(DDtable, DDreport.index[new_mask[:dd_end]]),
+        sources.rows(EFTtable, EFTdf.index[new_mask[dd_end:eft_end]]),
+        sources.rows(CHQtable, CHQs.index[new_mask[eft_end:]]),
+    )
+    write_report(output_path, sheets)
+    save_lines(result)
+
+    return summarydata
+
+
+def _extend(frame, rows):
+    if rows.empty:
+        return frame
+    return pd.concat([frame, rows], ignore_index=True)
+
+
+def save_lines(result, categories=None):
+    """Keep the exceptions of ``result`` as lines of the running job."""
+    with metrics.stage("save.lines") as stage:
+        stage["rows"] = results.save(result, categories)
+
+
+def write_report(output_path, sheets):
+    """Write ``(sheet name, frame)`` pairs to the workbook at ``output_path``.
+
+    A frame may also be a function returning it, to load it only now.
+    """
+    with ReportWriter(output_path) as report:
+        for sheet_name, frame in sheets:
+            with metrics.stage(f"write.{sheet_name}") as stage:
+                if callable(frame):
+                    frame = frame()
+                report.add(sheet_name, frame)
+                stage["rows"] = len(frame)
+            logger.debug("Created the %s sheet", sheet_name)
+
+
+def compare_statements(statement, pstatement, output_path):
+    """List the entries of ``pstatement`` that are missing from ``statement``.
+
+    Writes the Stat workbook to ``output_path`` and returns the summary rows.
+    """
+    with metrics.stage("parse.statement") as stage:
+        cleandf = load_statement(statement).entries
+        stage["rows"] = len(cleandf)
+
+    with metrics.stage("parse.pstatement") as stage:
+        cleanpdf, val = load_statement(pstatement)
+        stage["rows"] = len(cleanpdf)
+    if val is None:
+        raise ValueError(f"{pstatement} has no {BALANCE_LABEL} row")
+
+    postivesumd = cleanpdf[cleanpdf["AMOUNT"] > 0]["AMOUNT"].sum()
+    negativesumd = cleanpdf[cleanpdf["AMOUNT"] < 0]["AMOUNT"].sum()
+
+    with metrics.stage("join") as stage:
+        result = match(cleanpdf, cleandf)
+        T24Ep = result.statement_only
+        stage["rows"] = len(T24Ep)
+
+    summarydata = [
+        ["TOTAL STATEMENT CREDITS", postivesumd],
+        ["TOTAL STATEMENT DEBITS", negativesumd],
+        ["BALANCE AT THE END", val],
+    ]
+    summarypdf = pd.DataFrame(summarydata, columns=["DESCRIPTION", "AMOUNT"])
+
+    write_report(output_path, [("T24 Exceptions", T24Ep), ("Summary", summarypdf)])
+    save_lines(result, [ReconLine.T24])
+
+    return summarydata
+
+
+def compare_periods(statements, labels, output_path):
+    """Compare a run of statements, each with the one before it.
+
+    ``statements`` are the paths of the statements in period order and
+    ``labels`` name them in the report. Writes the Periods workbook to
+    ``output_path`` and returns the summary rows.
+    """
+    with metrics.stage("parse.periods") as stage:
+        # the same upload twice is stored once, so parse each path once
+        loaded = {}
+        for path, label in zip(statements, labels):
+            if path not in loaded:
+                try:
+                    loaded[path] = load_statement(path)
+                except Exception as exc:
+                    raise InputError(f"{label} statement", path, exc) from exc
+        stage["rows"] = sum(len(statement.entries) for statement in loaded.values())
+    statement_periods = [
+        periods.Period(label, *loaded[path]) for path, label in zip(statements, labels)
+    ]
+
+    with metrics.stage("join") as stage:
+        comparison = periods.compare(statement_periods)
+        stage["rows"] = len(comparison.changes)
+
+    changes = comparison.changes
+    rollforward = comparison.rollforward
+    summarydata = [
+        ["PERIODS", len(statement_periods)],
+        ["ENTRIES APPEARED", (changes["CHANGE"] == periods.APPEARED).sum()],
+        ["ENTRIES DISAPPEARED", (changes["CHANGE"] == periods.DISAPPEARED).sum()],
+        ["AMOUNTS CHANGED", (changes["CHANGE"] == periods.CHANGED).sum()],
+        ["BALANCE BREAKS", (rollforward["ROLLS FORWARD"].iloc[1:] != "YES").sum()],
+    ]
+    summarydf = pd.DataFrame(summarydata, columns=["DESCRIPTION", "AMOUNT"])
+
+    write_report(
+        output_path,
+        [("Summary", summarydf), ("Roll Forward", rollforward), ("Changes", changes)],
+    )
+
+    return summarydata
+
+
+def cleared_efts(efts, output_path):
+    """Export the cleared EFT columns of ``efts`` to ``output_path``."""
+    with metrics.stage("parse.efts") as stage:
+        eftdf = parse_cache.load(efts, "text", read_text, version=2)
+        stage["rows"] = len(eftdf)
+    clearedefts = eftdf[CLEARED_EFT_COLUMNS]
+    write_report(output_path, [("CLEARED EFTS", clearedefts)])
+
+    return []
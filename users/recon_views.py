@@ -0,0 +1,278 @@
+"""Views of the reconciliation pages, jobs and metrics.
+
+They need pandas and the reconciliation pipelines, which take a while to
+import and a good deal of memory. ``users.urls`` only imports this module
+when one of its routes is first requested, so workers that serve only the
+home, login, profile and password pages never load them.
+"""
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+
+from . import jobs, media, metrics, parse_cache, sessions, uploads
+from .forms import (
+    FileForm,
+    LineFilterForm,
+    PeriodsForm,
+    StatForm,
+    UploadedFileForm,
+    UploadedStatForm,
+)
+from .models import File, ReconJob, StatFile
+
+
+@login_required
+def read(request):
+    if request.method == "POST":
+        form = FileForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.save(commit=False)
+            upload.user = request.user
+            upload.save()
+
+            incremental = form.cleaned_data["incremental"]
+            job = jobs.submit(
+                ReconJob.INCREMENTAL if incremental else ReconJob.RECON,
+                upload.Statement.path,
+                upload.Cheques.path,
+                upload.Direct_Debit.path,
+                upload.EFTs.path,
+                user=request.user,
+            )
+            return redirect("job_detail", pk=job.pk)
+
+    else:
+        form = FileForm()
+
+    return render(request, "users/read.html", {"form": form, "process_complete": False})
+
+
+@login_required
+def stat(request):
+    if request.method == "POST":
+        form = StatForm(request.POST, request.FILES)
+        # Compared against the statement of the user's last reconciliation
+        last = _last_upload(request.user)
+        if last is None:
+            form.add_error(None, "Upload a reconciliation first.")
+        if form.is_valid():
+            upload = form.save(commit=False)
+            upload.user = request.user
+            upload.save()
+
+            job = jobs.submit(
+                ReconJob.STAT,
+                last.Statement.path,
+                upload.pstatement.path,
+                user=request.user,
+            )
+            return redirect("job_detail", pk=job.pk)
+
+    else:
+        form = StatForm()
+
+    return render(request, "users/stat.html", {"form": form, "process_complete": False})
+
+
+@login_required
+@require_POST
+def read_uploaded(request):
+    """Reconcile files sent as chunked uploads, see users/uploads.py."""
+    form = UploadedFileForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    files = dict(form.cleaned_data)
+    incremental = files.pop("incremental")
+    try:
+        names = uploads.stored_names(request.user, files)
+    except uploads.UploadError as error:
+        return JsonResponse({"error": str(error)}, status=error.status)
+    # the files are in upload_storage already, so only their names are saved
+    upload = File.objects.create(user=request.user, **names)
+
+    job = jobs.submit(
+        ReconJob.INCREMENTAL if incremental else ReconJob.RECON,
+        upload.Statement.path,
+        upload.Cheques.path,
+        upload.Direct_Debit.path,
+        upload.EFTs.path,
+        user=request.user,
+    )
+    return _submitted(job)
+
+
+@login_required
+@require_POST
+def stat_uploaded(request):
+    """Compare a statement sent as a chunked upload with the last one."""
+    form = UploadedStatForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    last = _last_upload(request.user)
+    if last is None:
+        return JsonResponse({"error": "Upload a reconciliation first."}, status=409)
+    try:
+        names = uploads.stored_names(request.user, form.cleaned_data)
+    except uploads.UploadError as error:
+        return JsonResponse({"error": str(error)}, status=error.status)
+    upload = StatFile.objects.create(user=request.user, **names)
+
+    job = jobs.submit(
+        ReconJob.STAT,
+        last.Statement.path,
+        upload.pstatement.path,
+        user=request.user,
+    )
+    return _submitted(job)
+
+
+def _last_upload(user):
+    return File.objects.filter(user=user).order_by("-pk").first()
+
+
+def _submitted(job):
+    return JsonResponse(
+        {
+            "id": job.pk,
+            "url": reverse("job_detail", args=[job.pk]),
+            "status_url": reverse("job_status", args=[job.pk]),
+        },
+        status=201,
+    )
+
+
+@login_required
+def periods(request):
+    if request.method == "POST":
+        form = PeriodsForm(request.POST, request.FILES)
+        if form.is_valid():
+            statements = form.cleaned_data["statements"]
+            # uploads are stored by content, so a statement sent again is
+            # not stored twice and its parse is reused
+            stored = [
+                StatFile.objects.create(user=request.user, pstatement=f)
+                for f in statements
+            ]
+
+            job = jobs.submit(
+                ReconJob.PERIODS,
+                [upload.pstatement.path for upload in stored],
+                [f.name for f in statements],
+                user=request.user,
+            )
+            return redirect("job_detail", pk=job.pk)
+
+    else:
+        form = PeriodsForm()
+
+    return render(request, "users/periods.html", {"form": form})
+
+
+@login_required
+def my_view(request):
+    # EFTs of the user's last reconciliation upload
+    last = _last_upload(request.user)
+    if last is None:
+        raise Http404("No reconciliation has been uploaded yet")
+
+    job = jobs.submit(
+        ReconJob.CLEARED_EFTS,
+        last.EFTs.path,
+        user=request.user,
+    )
+    return redirect("job_detail", pk=job.pk)
+
+
+def _get_job(request, pk, **filters):
+    # jobs are only visible to the user who started them
+    job = get_object_or_404(ReconJob, pk=pk, user=request.user, **filters)
+    jobs.fail_if_orphaned(job)
+    return job
+
+
+@login_required
+def job_detail(request, pk):
+    job = _get_job(request, pk)
+    return render(request, "users/job.html", {"job": job})
+
+
+@login_required
+def job_status(request, pk):
+    job = _get_job(request, pk)
+    response = JsonResponse(
+        {
+            "id": job.pk,
+            "kind": job.kind,
+            "status": job.status,
+            "summary": job.summary,
+            "error": job.error if job.status == ReconJob.FAILED else "",
+            "download_url": (
+                reverse("job_download", args=[job.pk])
+                if job.status == ReconJob.DONE
+                else None
+            ),
+        }
+    )
+    return _with_server_timing(response, job)
+
+
+@login_required
+def job_lines(request, pk):
+    job = _get_job(request, pk, status=ReconJob.DONE)
+    lines = job.lines.order_by("pk")
+
+    form = LineFilterForm(request.GET)
+    if form.is_valid():
+        filters = form.cleaned_data
+        if filters["category"]:
+            lines = lines.filter(category=filters["category"])
+        if filters["ft"]:
+            lines = lines.filter(ft__startswith=filters["ft"].upper())
+        if filters["min_amount"] is not None:
+            lines = lines.filter(abs_amount__gte=filters["min_amount"])
+        if filters["max_amount"] is not None:
+            lines = lines.filter(abs_amount__lte=filters["max_amount"])
+
+    page = Paginator(lines, 50).get_page(request.GET.get("page"))
+    query = request.GET.copy()
+    query.pop("page", None)
+    return render(
+        request,
+        "users/lines.html",
+        {"job": job, "form": form, "page": page, "query": query.urlencode()},
+    )
+
+
+@login_required
+def job_download(request, pk):
+    job = _get_job(request, pk, status=ReconJob.DONE)
+    if not job.result:
+        raise Http404("This job has no report")
+    filename = jobs.PIPELINES[job.kind][1]
+    response = media.send(
+        request, job.result.name, as_attachment=True, filename=filename
+    )
+    return _with_server_timing(response, job)
+
+
+def _with_server_timing(response, job):
+    if job.metrics:
+        response["Server-Timing"] = metrics.server_timing(job.metrics)
+    return response
+
+
+def metrics_view(request):
+    if not (
+        request.user.is_staff
+        or request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+    ):
+        raise Http404
+    return HttpResponse(
+        metrics.render(parse_cache.stats(), sessions.stats()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
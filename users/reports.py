@@ -0,0 +1,120 @@
+"""Constant-memory Excel report writer.
+
+``ReportWriter`` uses openpyxl's write-only mode: rows go straight to the
+sheet's XML stream on disk instead of building the workbook object model,
+and frames are converted a block of rows at a time. Memory use therefore
+does not grow with the size of the report.
+
+Text cells are escaped with ``unicode_escape`` on the way out (see
+``sanitize``) so characters Excel cannot hold do not break the export.
+"""
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+# rows converted from pandas to Python values at a time
+BLOCK_ROWS = 10000
+
+# characters unicode_escape rewrites: everything but printable ASCII, and "\\"
+_NEEDS_ESCAPE = r"[^\x20-\x5b\x5d-\x7e]"
+
+_THIN = Side(style="thin")
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+class ReportWriter:
+    """Write DataFrames as sheets of one workbook.
+
+    Use as a context manager; the workbook is saved to ``target`` (a path or
+    a binary file object) on exit::
+
+        with ReportWriter(output_path) as report:
+            report.add("Summary", summarydf)
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.workbook = Workbook(write_only=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def add(self, sheet_name, frame):
+        """Append ``frame`` as a new sheet, header first, without its index."""
+        sheet = self.workbook.create_sheet(title=sheet_name)
+        sheet.append([self._header(sheet, column) for column in frame.columns])
+
+        for start in range(0, len(frame), BLOCK_ROWS):
+            block = sanitize(frame.iloc[start : start + BLOCK_ROWS]).astype(object)
+            block = block.where(block.notna(), None)
+            for row in block.itertuples(index=False, name=None):
+                sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.target)
+
+    @staticmethod
+    def _header(sheet, column):
+        cell = WriteOnlyCell(sheet, value=str(column))
+        cell.font = _HEADER_FONT
+        cell.border = _HEADER_BORDER
+        cell.alignment = _HEADER_ALIGNMENT
+        return cell
+
+
+def sanitize(frame):
+    """Escape non-printable and non-ASCII characters in the text of ``frame``.
+
+    Only object, string and categorical columns are looked at. Each is
+    scanned with a vectorized ``str.contains``, and only the cells that need
+    it are rewritten with ``unicode_escape``; a categorical column has its
+    categories rewritten instead. Columns with nothing to escape are left as
+    they are, and so are non-text values in object columns.
+    """
+    escaped = {}
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = _escaped(values.cat.categories)
+            if categories is not None:
+                escaped[column] = values.cat.rename_categories(categories).array
+        elif pd.api.types.is_object_dtype(values) or isinstance(
+            values.dtype, pd.StringDtype
+        ):
+            cells = _escaped(values)
+            if cells is not None:
+                escaped[column] = cells
+
+    if not escaped:
+        return frame
+    frame = frame.copy()
+    for column, cells in escaped.items():
+        # by position: the index of a concatenated frame may repeat
+        frame[column] = cells
+    return frame
+
+
+def _escaped(values):
+    """Return the cells of ``values`` escaped where needed, or None if none are."""
+    try:
+        found = values.str.contains(_NEEDS_ESCAPE, regex=True, na=False)
+    except AttributeError:
+        # no text in the column
+        return None
+    found = np.asarray(found, dtype=bool)
+    if not found.any():
+        return None
+    cells = values.to_numpy(dtype=object, copy=True)
+    cells[found] = (
+        values[found].str.encode("unicode_escape").str.decode("utf-8").to_numpy()
+    )
+    return cells
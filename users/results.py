@@ -0,0 +1,107 @@
+"""Reconciliation exceptions kept as ``ReconLine`` rows.
+
+The workbook is a download; the lines let the exceptions of a job be
+browsed and filtered later without running it again. Pipelines call
+``save`` with their ``Match``; inside ``saving`` (which ``recon.run`` sets
+up for a job) the rows are bulk inserted for that job, elsewhere ``save``
+does nothing.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .models import ReconLine
+
+BATCH_SIZE = 5000
+
+# cleared columns that identify an item, in order of preference
+_REFERENCES = ["POLICY1", "ACHBULKID", "CHEQUENO"]
+
+_job = None
+
+
+@contextmanager
+def saving(job):
+    """Save lines for the ``ReconJob`` with pk ``job`` inside the block."""
+    global _job
+    _job = job
+    try:
+        yield
+    finally:
+        _job = None
+
+
+def save(result, categories=None):
+    """Store the exceptions and duplicates of a ``matching.Match``.
+
+    ``categories`` limits the lines to some ``ReconLine`` categories.
+    Returns the number of lines stored.
+    """
+    if _job is None:
+        return 0
+    frames = [
+        (ReconLine.T24, result.statement_only, "AMOUNT_x", True),
+        (ReconLine.CP, result.cleared_only, "AMOUNT_x", False),
+        (ReconLine.AMOUNT_CHECK, result.amount_mismatches, "AMOUNT_x", True),
+        (ReconLine.REVERSAL, result.statement_duplicates, "AMOUNT", True),
+        (ReconLine.CLEARED_DUPLICATE, result.cleared_duplicates, "AMOUNT", False),
+    ]
+    lines = []
+    for category, frame, amount, on_statement in frames:
+        if categories is not None and category not in categories:
+            continue
+        lines.extend(_lines(category, frame, amount, on_statement))
+    ReconLine.objects.bulk_create(lines, batch_size=BATCH_SIZE)
+    return len(lines)
+
+
+def _lines(category, frame, amount, on_statement):
+    n = len(frame)
+    amounts = _numbers(frame[amount]) if amount in frame else [None] * n
+    cleared = _numbers(frame["AMOUNT_y"]) if "AMOUNT_y" in frame else [None] * n
+    diffs = _numbers(frame["Diff"]) if "Diff" in frame else [None] * n
+    for ft, description, value, cleared_amount, diff in zip(
+        _texts(frame.get("FT"), n),
+        _texts(_description(frame, on_statement), n),
+        amounts,
+        cleared,
+        diffs,
+    ):
+        yield ReconLine(
+            job_id=_job,
+            category=category,
+            ft=ft[:32],
+            description=description[:64],
+            amount=value,
+            abs_amount=None if value is None else abs(value),
+            cleared_amount=cleared_amount,
+            diff=diff,
+        )
+
+
+def _description(frame, on_statement):
+    if on_statement:
+        return frame.get("NARRATION")
+    columns = [column for column in _REFERENCES if column in frame]
+    if not columns:
+        return None
+    # the first reference column set on each row, filled by position since
+    # bfill(axis=1) downcasts object columns and the index may repeat
+    values = frame[columns[0]].to_numpy(dtype=object, copy=True)
+    for column in columns[1:]:
+        missing = pd.isna(values)
+        values[missing] = frame[column].to_numpy(dtype=object)[missing]
+    return pd.Series(values, index=frame.index)
+
+
+def _texts(values, n):
+    if values is None:
+        return [""] * n
+    return values.astype(object).where(values.notna(), "").astype(str).tolist()
+
+
+def _numbers(values):
+    values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+    return [None if np.isnan(value) else value for value in values.tolist()]
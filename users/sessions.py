@@ -0,0 +1,141 @@
+"""Session engine with a shared cache in front of the database.
+
+Every authenticated request loads its session. With the database engine
+that is a read of ``django_session`` on SQLite per page view, and nothing
+ever deletes the expired rows of 30-day sessions.
+
+``SessionStore`` is Django's ``cached_db`` store: sessions are written
+through to the database and to the ``SESSION_CACHE_ALIAS`` cache, read from
+the cache, and deleted from both on logout. The cache is file based in
+``/dev/shm`` by default (see ``CACHES`` in the settings) so that every
+worker process on the host sees the same entries; a per-process cache would
+keep a session alive in other workers after its user logged out.
+
+Expired rows are deleted by ``sweep`` in small batches, so SQLite is never
+locked for long, from a background thread every ``SESSION_SWEEP_INTERVAL``
+seconds and from the ``sweepsessions`` management command. ``stats`` counts
+the cache hits and misses, writes, deletes and swept rows of this process
+for ``/metrics/``.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_COUNTERS = Counter()
+_COUNTERS_LOCK = threading.Lock()
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def stats():
+    """Return the session read, write, delete and sweep counts of this process."""
+    with _COUNTERS_LOCK:
+        return {
+            name: _COUNTERS[name]
+            for name in ("hits", "misses", "writes", "deletes", "swept")
+        }
+
+
+class SessionStore(cached_db.SessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        start_sweeper()
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            # some cache backends raise on keys they cannot store
+            data = None
+        if data is not None:
+            _count("hits")
+            return data
+
+        _count("misses")
+        session = self._get_session_from_db()
+        if not session:
+            return {}
+        data = self.decode(session.session_data)
+        self._cache.set(
+            self.cache_key, data, self.get_expiry_age(expiry=session.expire_date)
+        )
+        return data
+
+    def save(self, must_create=False):
+        super().save(must_create)
+        _count("writes")
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        _count("deletes")
+
+
+def sweep(batch_size=None):
+    """Delete the expired sessions, ``batch_size`` rows at a time.
+
+    Returns the number of sessions deleted.
+    """
+    batch_size = batch_size or settings.SESSION_SWEEP_BATCH
+    model = SessionStore.get_model_class()
+    swept = 0
+    while True:
+        keys = list(
+            model.objects.filter(expire_date__lt=timezone.now()).values_list(
+                "session_key", flat=True
+            )[:batch_size]
+        )
+        if not keys:
+            break
+        # expired entries have also expired in the cache
+        model.objects.filter(session_key__in=keys).delete()
+        swept += len(keys)
+    _count("swept", swept)
+    return swept
+
+
+def start_sweeper():
+    """Start this process's sweeper thread unless it runs already."""
+    global _sweeper
+    if _sweeper is not None or settings.SESSION_SWEEP_INTERVAL <= 0:
+        return
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(
+                target=_sweep_forever,
+                args=(settings.SESSION_SWEEP_INTERVAL,),
+                name="session-sweeper",
+                daemon=True,
+            )
+            _sweeper.start()
+
+
+def _sweep_forever(interval):
+    while True:
+        # spread the sweeps of workers started together
+        time.sleep(interval * random.uniform(0.5, 1.5))
+        close_old_connections()
+        try:
+            swept = sweep()
+        except Exception:
+            logger.exception("Could not sweep expired sessions")
+        else:
+            if swept:
+                logger.info("Swept %s expired sessions", swept)
+        finally:
+            close_old_connections()
+
+
+def _count(name, amount=1):
+    with _COUNTERS_LOCK:
+        _COUNTERS[name] += amount
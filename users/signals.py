@@ -1,8 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 
-from .models import Profile
+from . import auth_cache, donors
+from .models import Donor, Profile
 
 
 @receiver(post_save, sender=User)
@@ -12,6 +13,26 @@ def create_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_profile(sender, instance, created, update_fields=None, **kwargs):
+    # saves of some User fields, like last_login on every sign in, and
+    # profiles nobody loaded have nothing to write
+    if created or update_fields is not None or not User.profile.is_cached(instance):
+        return
+    changed = instance.profile.changed_fields()
+    if changed:
+        instance.profile.save(update_fields=changed)
 
+
+@receiver([post_save, post_delete], sender=User)
+def forget_user(sender, instance, **kwargs):
+    auth_cache.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def forget_profile(sender, instance, **kwargs):
+    auth_cache.invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Donor)
+def forget_donor_aggregates(sender, **kwargs):
+    donors.invalidate()
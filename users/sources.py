@@ -0,0 +1,86 @@
+"""Typed loaders for the DD, EFT and cheque clearing workbooks.
+
+Each ``Source`` declares the columns the reconciliation filters and joins
+on, the id columns that have to stay text and the low-cardinality columns
+held as categoricals. ``load`` returns a ``Table``: the narrow typed frame
+the pipeline works with, and ``full``, a function returning every column
+for the exported DDS, EFTs and CHQs sheets.
+
+The narrow frame is read with ``usecols`` and the id columns as text, so
+the wide frame is never held through the join. ``full`` reads the workbook
+again, full width, only when the sheets are exported. Both reads go through
+the parse cache, so a repeat upload parses neither.
+"""
+
+from collections import namedtuple
+
+from . import parse_cache, readers
+
+Source = namedtuple("Source", ["name", "columns", "ids", "categories"])
+Table = namedtuple("Table", ["frame", "full"])
+
+_CATEGORIES = ["DESTBANK", "STAGE", "STATUSID"]
+
+DIRECT_DEBITS = Source(
+    "direct_debits",
+    columns=["POLICY1", "FTREFERENCE", "AMOUNT", "STATUSID", "DESTBANK"],
+    ids=["PROCNO", "DESTACCOUNT"],
+    categories=_CATEGORIES,
+)
+EFTS = Source(
+    "efts",
+    columns=["ACHBULKID", "TRNREF", "AMOUNT"],
+    ids=["PROCNO", "DESTACCOUNT"],
+    categories=_CATEGORIES,
+)
+CHEQUES = Source(
+    "cheques",
+    columns=[
+        "CHEQUENO",
+        "CBS_REJECT_REASON",
+        "AMOUNT",
+        "STATUSID",
+        "DESTBANK",
+        "STAGE",
+    ],
+    ids=["PROCNO", "DESTACCOUNT", "CHEQUENO"],
+    categories=_CATEGORIES,
+)
+
+
+def read(path, source, columns=None):
+    """Read a clearing workbook with the dtypes of ``source``.
+
+    Only ``columns`` are read when given; the id columns are read as text.
+    """
+    usecols = None if columns is None else lambda name: name in columns
+    frame = readers.read_excel(
+        path, index_col=False, usecols=usecols, dtype=dict.fromkeys(source.ids, str)
+    )
+    ids = [column for column in source.ids if column in frame]
+    # blank ids stay "nan", as when the columns were cast after reading
+    frame[ids] = frame[ids].fillna("nan")
+    for column in source.categories:
+        if column in frame:
+            frame[column] = frame[column].astype("category")
+    if columns is not None:
+        frame = frame[[column for column in columns if column in frame]]
+    return frame
+
+
+def load(path, source):
+    """Return the ``Table`` of the workbook at ``path``."""
+
+    def parse_columns(path):
+        return read(path, source, source.columns)
+
+    def parse(path):
+        return read(path, source)
+
+    frame = parse_cache.load(path, f"{source.name}-columns", parse_columns)
+    return Table(frame, lambda: parse_cache.load(path, source.name, parse, version=2))
+
+
+def rows(table, index):
+    """Return a function giving the full width rows of ``table`` at ``index``."""
+    return lambda: table.full().loc[index]
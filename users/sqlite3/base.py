@@ -0,0 +1,83 @@
+"""SQLite backend tuned for several workers writing at once.
+
+With the stock backend every connection uses a rollback journal, so a
+writer blocks every reader, and ``atomic`` blocks start with a deferred
+``BEGIN``. When two deferred transactions both read and then try to write,
+SQLite cannot wait for either one and fails straight away with "database is
+locked", whatever the busy timeout is.
+
+This backend:
+
+* switches the database to WAL when a connection opens, so readers and the
+  single writer no longer block each other, and applies ``PRAGMAS``;
+* starts ``atomic`` blocks with ``BEGIN IMMEDIATE``, taking the write lock
+  up front where the busy timeout applies;
+* retries statements that still find the database locked outside a
+  transaction (including that ``BEGIN IMMEDIATE``) up to
+  ``SQLITE_LOCK_RETRIES`` times, backing off exponentially with jitter.
+  Statements inside a transaction are not retried, since the transaction
+  may have to start over.
+
+Use it as ``'ENGINE': 'users.sqlite3'``; ``OPTIONS['timeout']`` is the busy
+timeout in seconds as with the stock backend.
+"""
+
+import random
+import time
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+Database = base.Database
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    # in WAL mode a commit is durable once the WAL is checkpointed; a power
+    # loss may drop the last commits but never corrupts the database
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    # in KiB when negative
+    "cache_size": -16000,
+}
+
+# seconds before the first retry of a locked statement; doubles each retry
+RETRY_DELAY = 0.05
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=SQLiteCursorWrapper)
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    def execute(self, query, params=None):
+        return _retry(self, super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        return _retry(self, super().executemany, query, param_list)
+
+
+def _retry(cursor, execute, *args):
+    retries = 0 if cursor.connection.in_transaction else settings.SQLITE_LOCK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return execute(*args)
+        except Database.OperationalError as error:
+            if attempt == retries or not _is_locked(error):
+                raise
+        time.sleep(RETRY_DELAY * 2**attempt * random.uniform(0.5, 1.5))
+
+
+def _is_locked(error):
+    return getattr(error, "sqlite_errorcode", None) == Database.SQLITE_BUSY or str(
+        error
+    ).startswith("database is locked")
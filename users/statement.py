@@ -0,0 +1,145 @@
+"""Streaming parser for the fixed-width T24 STATEMENT extract.
+
+Each line of the extract holds six fixed-width fields (see ``WIDTHS``):
+reference, narration, FT reference, a filler column, the amount and the
+account. Amounts use a trailing minus for debits, e.g. ``1,234.00-``.
+
+``parse_statement`` reads the file in blocks and keeps only the rows of one
+account plus the closing balance, so memory is bounded by the size of the
+result rather than the size of the extract.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ACCOUNT = "KES1020000010001"
+WIDTHS = [13, 20, 15, 9, 32, 16]
+BALANCE_LABEL = "BALANCE AT PERIOD EN"
+
+# (start, end) offsets of every field
+_BOUNDS = []
+_start = 0
+for _width in WIDTHS:
+    _BOUNDS.append((_start, _start + _width))
+    _start += _width
+
+_REF, _NARRATION, _FT, _FILLER, _AMOUNT, _ACCOUNT = [slice(*b) for b in _BOUNDS]
+
+_CHUNK_SIZE = 4 << 20
+
+Statement = namedtuple("Statement", ["entries", "balance"])
+
+
+def parse_amount(value):
+    """Convert a T24 amount such as ``1,234.00-`` to a signed float."""
+    value = value.strip()
+    if not value:
+        return np.nan
+    if value.endswith("-"):
+        return -float(value.strip("- ").replace(",", ""))
+    return float(value.replace(",", ""))
+
+
+def parse_statement(path, account=ACCOUNT):
+    """Parse the entries of ``account`` out of the statement at ``path``.
+
+    Returns a ``Statement`` whose ``entries`` frame has the ``NARRATION``,
+    ``FT`` and ``AMOUNT`` columns sorted by amount, and whose ``balance`` is
+    the raw ``BALANCE AT PERIOD EN`` amount (``None`` if the row is missing).
+    """
+    narrations = []
+    fts = []
+    amounts = []
+    balances = []
+
+    with open(path, "rb") as f:
+        for lines in _read_lines(f):
+            _collect(lines, account, narrations, fts, amounts, balances)
+
+    entries = pd.DataFrame(
+        {
+            "NARRATION": pd.Series(narrations, dtype=object),
+            "FT": pd.Series(fts, dtype=object),
+            "AMOUNT": pd.Series(amounts, dtype=float),
+        }
+    )
+    entries = entries.sort_values(["AMOUNT"], kind="stable")
+
+    return Statement(entries, _closing_balance(balances))
+
+
+def _read_lines(f):
+    """Yield the lines of ``f`` a block at a time.
+
+    Pure ASCII blocks are yielded as ``bytes`` lines, which can be sliced by
+    byte offset. Anything else is decoded first, as multi-byte characters
+    would shift the byte offsets of the fixed-width fields.
+    """
+    tail = b""
+    while True:
+        block = f.read(_CHUNK_SIZE)
+        if not block:
+            break
+        block = tail + block
+        cut = block.rfind(b"\n") + 1
+        block, tail = block[:cut], block[cut:]
+        if block:
+            yield _split_block(block)
+    if tail:
+        yield _split_block(tail)
+
+
+def _split_block(block):
+    if block.isascii():
+        return block.split(b"\n")
+    return block.decode("utf-8").split("\n")
+
+
+def _collect(lines, account, narrations, fts, amounts, balances):
+    if not lines:
+        return
+    if isinstance(lines[0], bytes):
+        account = account.encode()
+        label = BALANCE_LABEL.encode()
+        minus, comma, empty = b"- ", b",", b""
+        decode = bytes.decode
+    else:
+        label = BALANCE_LABEL
+        minus, comma, empty = "- ", ",", ""
+        decode = str
+
+    rows = [line for line in lines if line[_ACCOUNT].strip() == account]
+    narrations.extend([decode(line[_NARRATION].strip()) or None for line in rows])
+    fts.extend([decode(line[_FT].strip()) or None for line in rows])
+    raw = [line[_AMOUNT].strip() for line in rows]
+    amounts.extend(
+        [
+            (
+                -float(value.strip(minus).replace(comma, empty))
+                if value.endswith(minus[:1])
+                else float(value.replace(comma, empty)) if value else np.nan
+            )
+            for value in raw
+        ]
+    )
+
+    balances.extend(
+        [
+            (decode(line[_REF].strip()), decode(line[_AMOUNT].strip()))
+            for line in lines
+            if line[_NARRATION].strip() == label
+        ]
+    )
+
+
+def _closing_balance(balances):
+    # The old read_fwf code sorted the whole file on the reference column and
+    # took the first balance row; pick the same row without the sort.
+    if not balances:
+        return None
+    try:
+        return min(balances, key=lambda row: float(row[0]) if row[0] else np.inf)[1]
+    except ValueError:
+        return min(balances, key=lambda row: (not row[0], row[0]))[1]
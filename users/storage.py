@@ -0,0 +1,48 @@
+"""Content-addressed storage for reconciliation uploads.
+
+Uploads used to be saved under their own names and replaced by the next
+upload of the same name, so two reconciliations running at once read each
+other's files. ``ContentAddressedStorage`` instead names every file after
+the SHA-256 of its bytes. A stored file therefore never changes under a
+running job, and uploading the same workbook again reuses the stored copy.
+"""
+
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Save files as ``<upload_to>/<sha[:2]>/<sha><ext>``.
+
+    Files are never overwritten or deleted through the storage, since
+    several rows may point at the same file.
+    """
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        if hasattr(content, "chunks"):
+            for chunk in content.chunks():
+                digest.update(chunk)
+        else:
+            for chunk in iter(lambda: content.read(1 << 20), b""):
+                digest.update(chunk)
+        content.seek(0)
+
+        name = hashed_name(name, digest.hexdigest())
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def delete(self, name):
+        pass
+
+
+def hashed_name(name, sha):
+    """Return where a file called ``name`` with SHA-256 ``sha`` is stored."""
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(os.path.dirname(name), sha[:2], sha + extension)
+
+
+upload_storage = ContentAddressedStorage()
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from benchmarks import generators
+from benchmarks.queries import BUDGETS, PASSWORD
+
+from . import avatars, recon
+
+_LOCAL = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+
+@override_settings(
+    CACHES={**settings.CACHES, "sessions": _LOCAL, "users": _LOCAL},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class QueryBudgetTests(TransactionTestCase):
+    """The sign-in and profile flows make the queries of ``BUDGETS``.
+
+    ``benchmarks.queries`` times the same flows; these run under
+    ``manage.py test``. A transaction test case, so the counts include the
+    transactions the views open, as they do outside of tests.
+    """
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, "default.jpg"), media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        for alias in ("sessions", "users"):
+            caches[alias].clear()
+        self.user = User.objects.create_user("budget", "budget@example.com", PASSWORD)
+        self.addCleanup(_wait_for_thumbnails)
+        # saving them would drop the user from the cache
+        _wait_for_thumbnails()
+
+    def test_login(self):
+        with self.assertNumQueries(BUDGETS["login"]):
+            response = self.client.post(
+                "/login/", {"username": self.user.username, "password": PASSWORD}
+            )
+        self.assertEqual(response.status_code, 302)
+
+    def test_register(self):
+        with self.assertNumQueries(BUDGETS["register"]):
+            response = self.client.post(
+                "/register/",
+                {
+                    "first_name": "New",
+                    "last_name": "User",
+                    "username": "new",
+                    "email": "new@example.com",
+                    "password1": PASSWORD,
+                    "password2": PASSWORD,
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+
+    def test_profile_view(self):
+        self._sign_in()
+        with self.assertNumQueries(BUDGETS["profile view"]):
+            response = self.client.get("/profile/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_update(self):
+        self._sign_in()
+        with self.assertNumQueries(BUDGETS["profile update"]):
+            response = self.client.post(
+                "/profile/",
+                {
+                    "username": self.user.username,
+                    "email": self.user.email,
+                    "bio": "bio",
+                },
+            )
+        self.assertEqual(response.status_code, 302)
+
+    def _sign_in(self):
+        self.client.force_login(self.user)
+        # the first page after signing in loads the user into the cache
+        self.client.get("/")
+
+
+def _wait_for_thumbnails():
+    # thumbnails are made off the request; keep them out of the counts
+    avatars.get_executor().submit(lambda: None).result()
+
+
+@override_settings(RECON_CACHE_ENABLED=False)
+class IncrementalReconTests(TestCase):
+    """Incremental runs carry the open exceptions forward as they were."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.inputs = generators.generate(self.directory, 5000, seed=0)
+
+    def test_same_inputs_twice(self):
+        first_summary, first = self._run("first")
+        second_summary, second = self._run("second")
+
+        self.assertEqual(second_summary["NEW STATEMENT ENTRIES"], 0)
+        self.assertEqual(second_summary["NEW CLEARED ITEMS"], 0)
+        for line in ("OPEN T24 EXCEPTIONS", "OPEN CP EXCEPTIONS"):
+            self.assertEqual(second_summary[line], first_summary[line], line)
+        # reversals share their FT, and both legs have to come back
+        self.assertTrue(first["T24 Exceptions"]["FT"].duplicated().any())
+        for sheet in ("T24 Exceptions", "CP Exceptions"):
+            pd.testing.assert_frame_equal(
+                _exceptions(second[sheet]), _exceptions(first[sheet]), obj=sheet
+            )
+
+    def _run(self, name):
+        output = os.path.join(self.directory, f"{name}.xlsx")
+        summary = recon.reconcile_incremental(
+            self.inputs["statement"],
+            self.inputs["cheques"],
+            self.inputs["direct_debit"],
+            self.inputs["efts"],
+            output,
+        )
+        return dict(summary), pd.read_excel(output, sheet_name=None)
+
+
+def _exceptions(sheet):
+    # carried forward rows only have the FT and amounts the ledger keeps
+    columns = ["FT", "AMOUNT_x", "AMOUNT_y"]
+    return sheet[columns].sort_values(columns).reset_index(drop=True)
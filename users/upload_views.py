@@ -0,0 +1,72 @@
+"""JSON endpoints for the chunked uploads in ``users.uploads``.
+
+``POST uploads/`` with ``filename``, ``size`` and optionally ``sha256``
+starts an upload. Each chunk is a ``PUT`` of the raw bytes to the upload's
+URL with ``Upload-Offset`` and ``Chunk-SHA256`` headers; ``GET`` tells how
+much has been received, to resume from, and ``DELETE`` drops the upload.
+"""
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
+
+from . import uploads
+from .forms import UploadStartForm
+from .models import UploadSession
+
+
+@login_required
+@require_POST
+def upload_start(request):
+    form = UploadStartForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    try:
+        session = uploads.start(request.user, **form.cleaned_data)
+    except uploads.UploadError as error:
+        return JsonResponse({"error": str(error)}, status=error.status)
+    return JsonResponse(_state(session), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "PUT", "DELETE"])
+def upload_detail(request, pk):
+    session = get_object_or_404(UploadSession, pk=pk, user=request.user)
+    if request.method == "DELETE":
+        uploads.abort(session)
+        return HttpResponse(status=204)
+    if request.method == "PUT":
+        if "Content-Length" not in request.headers:
+            return JsonResponse({"error": "Send a Content-Length."}, status=411)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers["Content-Length"])
+            checksum = request.headers["Chunk-SHA256"]
+        except (KeyError, ValueError):
+            return JsonResponse(
+                {"error": "Send an Upload-Offset and a Chunk-SHA256."}, status=400
+            )
+        try:
+            # the body is read as it arrives, never held in memory whole
+            uploads.write_chunk(session, offset, request, length, checksum)
+        except uploads.UploadError as error:
+            return JsonResponse(
+                {"error": str(error), **_state(session)}, status=error.status
+            )
+    return JsonResponse(_state(session))
+
+
+def _state(session):
+    return {
+        "id": session.pk,
+        "filename": session.filename,
+        "size": session.size,
+        "received": session.received,
+        "chunk_size": settings.UPLOAD_CHUNK_SIZE,
+        "status": session.status,
+        "sha256": session.sha256,
+        "url": reverse("upload_detail", args=[session.pk]),
+    }
@@ -0,0 +1,234 @@
+"""Resumable uploads of statements and clearing reports, sent in chunks.
+
+``FileForm`` and ``StatForm`` take their files in one multipart POST: Django
+spools each file to a temporary file, which ``upload_storage`` reads again
+to hash and then moves under ``MEDIA_ROOT``, or copies when the temporary
+directory is on another file system. A dropped connection means sending
+the whole file again.
+
+Here a client ``start``\\s an ``UploadSession`` with the file's name and
+size, then sends its bytes in order in chunks of up to ``UPLOAD_CHUNK_SIZE``
+with the SHA-256 of each chunk. ``write_chunk`` streams a chunk from the
+request straight into the partial file, hashing it and the whole file as it
+goes, and keeps it only if its checksum matches. After a dropped connection
+the client asks for ``received`` and carries on from there. The last chunk
+moves the partial file to its content-addressed name in ``upload_storage``
+with ``os.replace``, so the file is written once and never copied, and
+``stored_names`` hands that name to ``File`` and ``StatFile`` rows.
+
+The running SHA-256 of each file is kept in the process that took its last
+chunk. A chunk that lands in another worker, or after a restart, hashes the
+partial file once to catch up. Chunks of one upload are written one at a
+time under a lock on the partial file.
+
+Unfinished uploads are removed ``UPLOAD_SESSION_MAX_AGE`` seconds after
+their last chunk.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import UploadSession
+from .storage import hashed_name, upload_storage
+
+logger = logging.getLogger(__name__)
+
+# where files are written while their chunks arrive, in upload_storage
+PARTIAL_DIRECTORY = "uploads/partial"
+# where complete files go, as the ``upload_to`` of File and StatFile
+DIRECTORY = "uploads"
+
+BLOCK_SIZE = 64 * 1024
+
+# expired uploads removed at a time
+EXPIRE_BATCH = 100
+
+# upload id -> (bytes hashed, SHA-256 of them)
+_hashes = {}
+_hashes_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """A request the upload cannot take, answered with ``status``."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def start(user, filename, size, sha256=""):
+    """Start an upload of ``size`` bytes and return its ``UploadSession``."""
+    if size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(
+            f"Files may be up to {settings.UPLOAD_MAX_SIZE} bytes.", status=413
+        )
+    expire()
+    session = UploadSession.objects.create(
+        user=user,
+        filename=os.path.basename(filename),
+        size=size,
+        expected_sha256=sha256.lower(),
+    )
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+    return session
+
+
+def write_chunk(session, offset, stream, length, checksum):
+    """Append ``length`` bytes read from ``stream`` at ``offset``.
+
+    ``checksum`` is the hex SHA-256 of the chunk. A chunk that is short or
+    does not match it is dropped and has to be sent again. The last chunk
+    completes the upload.
+    """
+    if session.status != UploadSession.UPLOADING:
+        raise UploadError(f"The upload is {session.status}.", status=409)
+    if length <= 0 or length > settings.UPLOAD_CHUNK_SIZE:
+        raise UploadError(
+            f"Chunks are 1 to {settings.UPLOAD_CHUNK_SIZE} bytes.", status=413
+        )
+    try:
+        f = open(partial_path(session), "r+b")
+    except FileNotFoundError:
+        raise UploadError("The upload has expired.", status=410)
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("Another chunk is being written.", status=409)
+        # a chunk may have been taken while this one waited for the lock
+        session.refresh_from_db(fields=["received", "status"])
+        if session.status != UploadSession.UPLOADING:
+            raise UploadError(f"The upload is {session.status}.", status=409)
+        if offset != session.received:
+            raise UploadError(f"Expected offset {session.received}.", status=409)
+        if offset + length > session.size:
+            raise UploadError("The chunk runs past the end of the file.")
+
+        file_hash = _file_hash(session, f).copy()
+        chunk_hash = hashlib.sha256()
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            f.write(block)
+            chunk_hash.update(block)
+            file_hash.update(block)
+            remaining -= len(block)
+        if remaining or chunk_hash.hexdigest() != checksum.lower():
+            f.truncate(offset)
+            raise UploadError(
+                "The chunk was cut short." if remaining else "Chunk checksum mismatch."
+            )
+        f.flush()
+
+        session.received = offset + length
+        UploadSession.objects.filter(pk=session.pk).update(
+            received=session.received, updated_at=timezone.now()
+        )
+        if session.received < session.size:
+            with _hashes_lock:
+                _hashes[session.pk] = (session.received, file_hash)
+        else:
+            _complete(session, file_hash.hexdigest())
+    return session
+
+
+def stored_names(user, uploads):
+    """Return the stored file of each complete upload in ``uploads``.
+
+    ``uploads`` maps keys to upload ids of ``user``; the names are returned
+    under the same keys, ready to be assigned to a ``FileField``.
+    """
+    sessions = UploadSession.objects.filter(user=user, pk__in=uploads.values())
+    names = {str(session.pk): session.name for session in sessions if session.name}
+    missing = [key for key, pk in uploads.items() if str(pk) not in names]
+    if missing:
+        raise UploadError(f"No complete upload for {', '.join(missing)}.", status=409)
+    return {key: names[str(pk)] for key, pk in uploads.items()}
+
+
+def abort(session):
+    """Drop ``session`` and whatever it has received."""
+    _forget(session)
+    session.delete()
+
+
+def expire():
+    """Remove uploads that have not been sent a chunk for too long."""
+    cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_SESSION_MAX_AGE)
+    stale = UploadSession.objects.filter(
+        status__in=[UploadSession.UPLOADING, UploadSession.FAILED],
+        updated_at__lt=cutoff,
+    )[:EXPIRE_BATCH]
+    for session in stale:
+        logger.info("Removing expired upload %s", session)
+        abort(session)
+
+
+def partial_path(session):
+    return upload_storage.path(f"{PARTIAL_DIRECTORY}/{session.pk}")
+
+
+def _file_hash(session, f):
+    """Return the SHA-256 of the first ``session.received`` bytes of ``f``."""
+    with _hashes_lock:
+        hashed, file_hash = _hashes.get(session.pk, (None, None))
+    if hashed == session.received:
+        return file_hash
+    # the earlier chunks went to another worker, or before a restart
+    file_hash = hashlib.sha256()
+    f.seek(0)
+    remaining = session.received
+    while remaining:
+        block = f.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            break
+        file_hash.update(block)
+        remaining -= len(block)
+    return file_hash
+
+
+def _complete(session, sha256):
+    path = partial_path(session)
+    with _hashes_lock:
+        _hashes.pop(session.pk, None)
+    if session.expected_sha256 and sha256 != session.expected_sha256:
+        os.remove(path)
+        session.sha256 = sha256
+        session.status = UploadSession.FAILED
+        session.save(update_fields=["sha256", "status", "updated_at"])
+        raise UploadError("File checksum mismatch.", status=422)
+
+    name = hashed_name(f"{DIRECTORY}/{session.filename}", sha256)
+    target = upload_storage.path(name)
+    if os.path.exists(target):
+        # the same file was uploaded before
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(path, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(path, target)
+    session.sha256 = sha256
+    session.name = name
+    session.status = UploadSession.COMPLETE
+    session.save(update_fields=["sha256", "name", "status", "updated_at"])
+
+
+def _forget(session):
+    with _hashes_lock:
+        _hashes.pop(session.pk, None)
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
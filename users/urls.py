@@ -1,11 +1,48 @@
+from importlib import import_module
+
 from django.urls import path
-from .views import home, profile, RegisterView, read, stat, my_view
+from .donor_views import donor_distribution, donor_top, donor_totals
+from .upload_views import upload_detail, upload_start
+from .views import (
+    home,
+    profile,
+    RegisterView,
+)
+
+
+def recon_view(name):
+    """Return a view that imports ``recon_views`` the first time it is called.
+
+    Importing the reconciliation views loads pandas and the pipelines, which
+    workers serving only the account pages should not pay for.
+    """
+
+    def view(request, *args, **kwargs):
+        recon_views = import_module("users.recon_views")
+        return getattr(recon_views, name)(request, *args, **kwargs)
+
+    view.__name__ = view.__qualname__ = name
+    return view
+
 
 urlpatterns = [
     path("", home, name="users-home"),
     path("register/", RegisterView.as_view(), name="users-register"),
     path("profile/", profile, name="users-profile"),
-    path("read/", read, name="read"),
-    path("stat/", stat, name="stat"),
-    path("test/", my_view, name="my_view"),
+    path("read/", recon_view("read"), name="read"),
+    path("read/uploaded/", recon_view("read_uploaded"), name="read_uploaded"),
+    path("stat/", recon_view("stat"), name="stat"),
+    path("stat/uploaded/", recon_view("stat_uploaded"), name="stat_uploaded"),
+    path("stat/periods/", recon_view("periods"), name="periods"),
+    path("test/", recon_view("my_view"), name="my_view"),
+    path("jobs/<int:pk>/", recon_view("job_detail"), name="job_detail"),
+    path("jobs/<int:pk>/status/", recon_view("job_status"), name="job_status"),
+    path("jobs/<int:pk>/download/", recon_view("job_download"), name="job_download"),
+    path("jobs/<int:pk>/lines/", recon_view("job_lines"), name="job_lines"),
+    path("metrics/", recon_view("metrics_view"), name="metrics"),
+    path("uploads/", upload_start, name="upload_start"),
+    path("uploads/<uuid:pk>/", upload_detail, name="upload_detail"),
+    path("donors/totals/", donor_totals, name="donor_totals"),
+    path("donors/top/", donor_top, name="donor_top"),
+    path("donors/distribution/", donor_distribution, name="donor_distribution"),
 ]